@@ -6,11 +6,11 @@ import os
 import re
 import base64
 import plotly.express as px
-import matplotlib.pyplot as plt
 from wordcloud import WordCloud
 from io import BytesIO
 from PIL import Image
-from unidecode import unidecode
+from brand_matcher import BrandMatcher
+from normalization import dedup_keys
 from datetime import datetime
 
 # === CONFIG STREAMLIT ===
@@ -92,37 +92,106 @@ uploaded_file = st.sidebar.file_uploader("Charger le fichier SEMrush (CSV)", typ
 branded_file = st.sidebar.file_uploader("Mots-clés de marque (CSV, une colonne)", type=["csv"])
 stopwords_file = st.sidebar.file_uploader("Liste de stopwords personnalisés (optionnel)", type=["csv"])
 terms_to_exclude = ['free', 'torrent', 'crack', 'pirate', 'illegal', 'mp3', 'streaming', 'download', 'youtube']
+min_volume, max_kd, min_words = 100, 60, 2
+
+
+# === HISTOGRAMMES PRÉ-CALCULÉS ===
+# Seuls les bords et effectifs des classes partent au navigateur : la taille du graphique ne dépend pas
+# du nombre de lignes. Calcul mis en cache par état des filtres (fichiers chargés et seuils).
+@st.cache_data(max_entries=32, show_spinner=False)
+def histogram_bins(filter_state, column, nbins, scale, _values):
+    values = np.asarray(_values, dtype=float)
+    values = values[np.isfinite(values)]
+    if scale == "log":
+        # Classes logarithmiques : les volumes s'étalent sur plusieurs ordres de grandeur
+        values = values[values > 0]
+        if len(values) == 0:
+            return np.zeros(0, dtype=int), np.zeros(1)
+        low, high = values.min(), values.max()
+        edges = np.geomspace(low, high if high > low else low * 10, nbins + 1)
+    elif scale == "integer":
+        # Une classe par valeur entière (nombre de mots)
+        if len(values) == 0:
+            return np.zeros(0, dtype=int), np.zeros(1)
+        edges = np.arange(values.min() - 0.5, values.max() + 1.5)
+    else:
+        edges = np.histogram_bin_edges(values, bins=nbins)
+    return np.histogram(values, bins=edges)
+
+
+def histogram_figure(counts, edges, title, x_label, scale):
+    if scale == "log":
+        # Axe par classes (libellés des bornes) : les classes logarithmiques gardent la même largeur
+        x = [f"{low:,.0f}–{high:,.0f}" for low, high in zip(edges[:-1], edges[1:])]
+        fig = px.bar(x=x, y=counts, title=title, labels={"x": x_label, "y": "count"})
+    else:
+        fig = px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, title=title, labels={"x": x_label, "y": "count"})
+        fig.update_traces(width=np.diff(edges))
+    fig.update_layout(bargap=0)
+    return fig
+
+
+# === WORDCLOUD PRÉ-CALCULÉ ===
+# Nuage construit à partir des fréquences des wordcloud_max_words mots les plus fréquents (mots découpés
+# comme le fait WordCloud, mots vides retirés au comptage), rendu une seule fois en PNG par état des filtres et liste de mots vides :
+# l'aperçu et le téléchargement réutilisent les mêmes octets.
+wordcloud_max_words = 200
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def wordcloud_png(filter_state, stopwords, _keywords):
+    tokens = pd.Series(_keywords, dtype=object).str.findall(r"\w[\w']*").explode()
+    tokens = tokens[tokens.notna() & ~tokens.isin(stopwords)]
+    frequencies = tokens.value_counts().head(wordcloud_max_words)
+    if frequencies.empty:
+        return None
+    wordcloud = WordCloud(
+        width=1200,
+        height=600,
+        background_color='white',
+        max_words=wordcloud_max_words,
+        colormap='Greens'
+    ).generate_from_frequencies(frequencies.to_dict())
+    buffer = BytesIO()
+    wordcloud.to_image().save(buffer, format="PNG")
+    return buffer.getvalue()
+
 
 if uploaded_file is not None:
     df = pd.read_csv(uploaded_file)
     st.success("Fichier SEMrush chargé avec succès.")
     
-    # Nettoyage de base
+    # Nettoyage de base (doublons à la casse, aux accents et aux espaces près ; "c++" et "c#" restent distincts)
     df.dropna(subset=['Keyword'], inplace=True)
-    df.drop_duplicates(subset=['Keyword'], inplace=True)
+    df = df[~dedup_keys(df['Keyword']).duplicated().to_numpy()]
     
     df['Volume'] = pd.to_numeric(df['Volume'], errors='coerce')
     df['KD'] = pd.to_numeric(df['KD'], errors='coerce')
     df.dropna(subset=['Volume', 'KD'], inplace=True)
 
     df['Keyword'] = df['Keyword'].astype(str).str.lower().str.strip()
-    df['word_count'] = df['Keyword'].apply(lambda x: len(x.split()))
+    df['word_count'] = df['Keyword'].str.split().str.len()
     # Branded keywords
     if branded_file is not None:
         branded_keywords_df = pd.read_csv(branded_file)
-        branded_list = branded_keywords_df.iloc[:, 0].dropna().astype(str).str.lower().tolist()
-        df['Branded'] = df['Keyword'].apply(lambda kw: any(brand in kw for brand in branded_list))
+        # Marque en minuscules cherchée comme sous-chaîne du mot-clé en minuscules, marques courtes comprises
+        brand_matcher = BrandMatcher(branded_keywords_df.iloc[:, 0].dropna(), short_whole_word=False, normalize=str.lower)
+        df['Branded'] = brand_matcher.is_branded_many(df['Keyword'])
     else:
         df['Branded'] = False
 
     # Application des filtres
     df_filtered = df[
-        (df['Volume'] >= 100) &
-        (df['KD'] <= 60) &
-        (df['word_count'] >= 2) &
+        (df['Volume'] >= min_volume) &
+        (df['KD'] <= max_kd) &
+        (df['word_count'] >= min_words) &
         (~df['Keyword'].str.contains('|'.join(terms_to_exclude), case=False, na=False)) &
-        (df['Branded'] == False)
+        (~df['Branded'])
     ]
+    filter_state = (
+        uploaded_file.file_id, branded_file.file_id if branded_file is not None else None,
+        min_volume, max_kd, min_words, tuple(terms_to_exclude)
+    )
 
     st.subheader("Mots-clés filtrés")
     st.write(f"{len(df_filtered)} mots-clés restants après filtrage")
@@ -137,40 +206,35 @@ if uploaded_file is not None:
 
     # === WORDCLOUD ===
     st.subheader("Nuage de mots (WordCloud)")
+    wordcloud_bytes = None
     if not df_filtered.empty:
-        text = " ".join(df_filtered['Keyword'])
         if stopwords_file is not None:
             stopwords_df = pd.read_csv(stopwords_file)
-            stopwords_list = stopwords_df.iloc[:, 0].dropna().astype(str).tolist()
-            stopwords = set(stopwords_list)
+            # Mots vides en minuscules, comme les mots-clés comptés (WordCloud les comparait sans casse)
+            stopwords_list = stopwords_df.iloc[:, 0].dropna().astype(str).str.lower().str.strip().tolist()
+            stopwords = tuple(sorted(set(stopwords_list) - {""}))
         else:
-            stopwords = set()
-
-        wordcloud = WordCloud(
-            width=1200,
-            height=600,
-            background_color='white',
-            stopwords=stopwords,
-            colormap='Greens'
-        ).generate(text)
-
-        fig, ax = plt.subplots(figsize=(12, 6))
-        ax.imshow(wordcloud, interpolation='bilinear')
-        ax.axis("off")
-        st.pyplot(fig)
+            stopwords = ()
+
+        wordcloud_bytes = wordcloud_png(filter_state, stopwords, df_filtered['Keyword'].to_numpy())
+        if wordcloud_bytes is not None:
+            st.image(wordcloud_bytes, use_container_width=True)
     # === HISTOGRAMME VOLUME ===
     st.subheader("Répartition des volumes de recherche")
-    fig_vol = px.histogram(df_filtered, x='Volume', nbins=50, title='Distribution du Volume')
+    counts, edges = histogram_bins(filter_state, 'Volume', 50, "log", df_filtered['Volume'].to_numpy())
+    fig_vol = histogram_figure(counts, edges, 'Distribution du Volume', 'Volume', "log")
     st.plotly_chart(fig_vol, use_container_width=True)
 
     # === HISTOGRAMME KD ===
     st.subheader("Répartition du Keyword Difficulty (KD)")
-    fig_kd = px.histogram(df_filtered, x='KD', nbins=50, title='Distribution du KD')
+    counts, edges = histogram_bins(filter_state, 'KD', 50, "linear", df_filtered['KD'].to_numpy())
+    fig_kd = histogram_figure(counts, edges, 'Distribution du KD', 'KD', "linear")
     st.plotly_chart(fig_kd, use_container_width=True)
 
     # === HISTOGRAMME NB DE MOTS ===
     st.subheader("Répartition du nombre de mots par keyword")
-    fig_wc = px.histogram(df_filtered, x='word_count', nbins=15, title='Nombre de mots dans les keywords')
+    counts, edges = histogram_bins(filter_state, 'word_count', 15, "integer", df_filtered['word_count'].to_numpy())
+    fig_wc = histogram_figure(counts, edges, 'Nombre de mots dans les keywords', 'word_count', "integer")
     st.plotly_chart(fig_wc, use_container_width=True)
 
     # === HEATMAP DES CORRÉLATIONS ===
@@ -182,16 +246,13 @@ if uploaded_file is not None:
         st.plotly_chart(fig_corr, use_container_width=True)
     # === TÉLÉCHARGEMENT DE L’IMAGE DU WORDCLOUD ===
     st.subheader("Exporter le WordCloud en image")
-    buffer = BytesIO()
-    wordcloud.to_image().save(buffer, format="PNG")
-    byte_im = buffer.getvalue()
-
-    st.download_button(
-        label="Télécharger le WordCloud",
-        data=byte_im,
-        file_name="wordcloud_keywords.png",
-        mime="image/png"
-    )
+    if wordcloud_bytes is not None:
+        st.download_button(
+            label="Télécharger le WordCloud",
+            data=wordcloud_bytes,
+            file_name="wordcloud_keywords.png",
+            mime="image/png"
+        )
 
 else:
     st.warning("Veuillez charger un fichier SEMrush et une liste de branded keywords pour démarrer le traitement.")
@@ -0,0 +1,170 @@
+"""Générateur d'exports SEMrush synthétiques pour les benchmarks.
+
+Mots-clés tirés d'un vocabulaire à distribution de Zipf (quelques mots très fréquents, une longue
+traîne), une part des mots-clés contenant une marque de la liste générée, colonnes numériques aux
+distributions proches des exports réels. Les fichiers sont écrits par morceaux : 10M de lignes
+tiennent en mémoire bornée.
+
+    python benchmarks/generate.py export.csv --rows 1000000 --brands 5000
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    "Keyword", "Position", "Previous position", "Search Volume", "Keyword Difficulty", "CPC", "URL",
+    "Traffic", "Traffic (%)", "Traffic Cost", "Competition", "Number of Results", "Trends", "Timestamp",
+    "SERP Features by Keyword", "Keyword Intents", "Position Type",
+]
+
+# Paliers de volume affichés par SEMrush
+VOLUME_BUCKETS = np.array([
+    10, 20, 30, 40, 50, 70, 90, 110, 140, 170, 210, 260, 320, 390, 480, 590, 720, 880, 1000, 1300,
+    1600, 1900, 2400, 2900, 3600, 4400, 5400, 6600, 8100, 9900, 12100, 14800, 18100, 22200, 27100,
+    33100, 40500, 49500, 60500, 74000, 90500, 110000, 135000, 165000, 201000, 246000, 301000,
+])
+INTENTS = ["informational", "commercial", "navigational", "transactional", "commercial, informational"]
+SERP_FEATURES = ["Sitelinks", "People also ask", "Image pack", "Video", "Local pack", "Reviews", ""]
+POSITION_TYPES = ["Organic", "Organic", "Organic", "Featured snippet", "Local pack"]
+
+_CONSONANTS = list("bcdfghjklmnprstvz") + ["ch", "tr", "br", "st"]
+_VOWELS = list("aeiou") + ["é", "ou", "ai", "è"]
+
+# Nombre de mots par mot-clé (1 à 6), surtout 2 à 4 comme dans les exports
+_LENGTH_WEIGHTS = np.array([0.08, 0.30, 0.30, 0.18, 0.09, 0.05])
+
+
+def _pseudo_words(n, rng, min_syllables=1, max_syllables=4):
+    # Mots prononçables (consonne + voyelle), accents compris, dédoublonnés
+    consonants = np.array(_CONSONANTS, dtype=object)
+    vowels = np.array(_VOWELS, dtype=object)
+    words = set()
+    while len(words) < n:
+        count = n - len(words)
+        syllables = (
+            consonants[rng.integers(len(consonants), size=(count, max_syllables))]
+            + vowels[rng.integers(len(vowels), size=(count, max_syllables))]
+        )
+        lengths = rng.integers(min_syllables, max_syllables + 1, size=count)
+        for k in range(min_syllables, max_syllables + 1):
+            words.update(syllables[lengths == k, :k].sum(axis=1))
+    return np.array(sorted(words), dtype=object)
+
+
+def make_vocabulary(size=20_000, seed=0):
+    """Vocabulaire des mots-clés, du plus fréquent au plus rare."""
+    rng = np.random.default_rng(seed)
+    vocabulary = _pseudo_words(size, rng)
+    rng.shuffle(vocabulary)
+    return vocabulary
+
+
+def make_brands(n, seed=0):
+    """Liste de n marques : surtout un mot, un quart de deux mots, quelques sigles de 2-3 lettres."""
+    rng = np.random.default_rng(seed + 1)
+    n_short = max(1, n // 10)
+    n_double = n // 4
+    words = _pseudo_words(n - n_short + n_double, rng, min_syllables=2, max_syllables=4)
+    rng.shuffle(words)
+    single = list(words[:n - n_short - n_double])
+    double = [f"{a} {b}" for a, b in zip(words[n - n_short - n_double:n - n_short], words[n - n_short:])]
+    letters = np.array(list("ABCDEFGHIJKLMNOPRSTUVWXYZ"))
+    short = set()
+    while len(short) < n_short:
+        short.add("".join(rng.choice(letters, size=rng.integers(2, 4))))
+    brands = single + double + sorted(short)
+    # Casse variable, comme dans les listes saisies à la main
+    return [b.title() if i % 3 == 0 else b for i, b in enumerate(brands)]
+
+
+def _keywords(rows, vocabulary, brands, brand_rate, rng):
+    ranks = np.arange(1, len(vocabulary) + 1)
+    weights = 1.0 / ranks ** 1.07
+    weights /= weights.sum()
+    lengths = rng.choice(np.arange(1, 7), size=rows, p=_LENGTH_WEIGHTS / _LENGTH_WEIGHTS.sum())
+    tokens = vocabulary[rng.choice(len(vocabulary), size=lengths.sum(), p=weights)]
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    keywords = np.empty(rows, dtype=object)
+    for length in range(1, 7):
+        rows_l = np.flatnonzero(lengths == length)
+        if not len(rows_l):
+            continue
+        parts = [pd.Series(tokens[starts[rows_l] + k]) for k in range(length)]
+        keywords[rows_l] = parts[0].str.cat(parts[1:], sep=" ").to_numpy() if length > 1 else parts[0].to_numpy()
+
+    # Marque insérée en début ou en fin de mot-clé
+    branded = np.flatnonzero(rng.random(rows) < brand_rate)
+    if len(branded) and len(brands):
+        chosen = np.asarray(brands, dtype=object)[rng.integers(0, len(brands), size=len(branded))]
+        before = rng.random(len(branded)) < 0.5
+        keywords[branded] = np.where(
+            before, chosen + " " + keywords[branded], keywords[branded] + " " + chosen
+        )
+    return keywords
+
+
+def generate_export(rows, brands, seed=0, brand_rate=0.15, vocabulary=None, domain="example.com"):
+    """DataFrame au format d'un export SEMrush (positions organiques) de rows lignes."""
+    rng = np.random.default_rng(seed)
+    vocabulary = make_vocabulary(seed=0) if vocabulary is None else vocabulary
+    volume_weights = 1.0 / np.arange(1, len(VOLUME_BUCKETS) + 1) ** 1.3
+    volumes = VOLUME_BUCKETS[rng.choice(len(VOLUME_BUCKETS), size=rows, p=volume_weights / volume_weights.sum())]
+    volumes = volumes.astype(object)
+    volumes[rng.random(rows) < 0.005] = "n/a"
+    position = rng.integers(1, 101, size=rows)
+    traffic = np.maximum(0, rng.normal(50, 80, size=rows)).round()
+    df = pd.DataFrame({
+        "Keyword": _keywords(rows, vocabulary, brands, brand_rate, rng),
+        "Position": position,
+        "Previous position": np.where(rng.random(rows) < 0.2, 0, np.clip(position + rng.integers(-10, 11, size=rows), 1, 100)),
+        "Search Volume": volumes,
+        "Keyword Difficulty": np.clip(rng.beta(2.2, 2.5, size=rows) * 100, 0, 100).round().astype(int),
+        "CPC": rng.gamma(1.5, 0.8, size=rows).round(2),
+        "URL": f"https://{domain}/page-" + pd.Series(rng.integers(0, 2_000, size=rows)).astype(str),
+        "Traffic": traffic,
+        "Traffic (%)": (rng.random(rows) * 0.5).round(2),
+        "Traffic Cost": (traffic * rng.gamma(1.5, 0.8, size=rows)).round(),
+        "Competition": rng.random(rows).round(2),
+        "Number of Results": rng.integers(1_000, 5_000_000_000, size=rows),
+        "Trends": "0.54,0.66,0.66,0.81,0.81,1.00,0.81,0.66,0.66,0.54,0.54,0.54",
+        "Timestamp": "2025-06-01",
+        "SERP Features by Keyword": rng.choice(SERP_FEATURES, size=rows),
+        "Keyword Intents": rng.choice(INTENTS, size=rows),
+        "Position Type": rng.choice(POSITION_TYPES, size=rows),
+    })
+    return df[COLUMNS]
+
+
+def write_export(path, rows, brands, seed=0, brand_rate=0.15, chunk_rows=500_000):
+    """Écrit un export CSV de rows lignes, morceau par morceau."""
+    vocabulary = make_vocabulary(seed=0)
+    written = 0
+    while written < rows:
+        n = min(chunk_rows, rows - written)
+        chunk = generate_export(n, brands, seed=seed + written, brand_rate=brand_rate, vocabulary=vocabulary)
+        chunk.to_csv(path, mode="w" if written == 0 else "a", header=written == 0, index=False)
+        written += n
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère un export SEMrush synthétique (CSV).")
+    parser.add_argument("output", help="fichier CSV à écrire")
+    parser.add_argument("--rows", type=int, default=100_000, help="nombre de lignes (jusqu'à 10M)")
+    parser.add_argument("--brands", type=int, default=1_000, help="taille de la liste de marques (10 à 50k)")
+    parser.add_argument("--brand-rate", type=float, default=0.15, help="part des mots-clés contenant une marque")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--brands-output", help="écrit aussi la liste de marques (une par ligne)")
+    args = parser.parse_args(argv)
+
+    brands = make_brands(args.brands, seed=args.seed)
+    write_export(args.output, args.rows, brands, seed=args.seed, brand_rate=args.brand_rate)
+    if args.brands_output:
+        with open(args.brands_output, "w", encoding="utf-8") as f:
+            f.write("\n".join(brands) + "\n")
+
+
+if __name__ == "__main__":
+    main()
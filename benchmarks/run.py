@@ -0,0 +1,295 @@
+"""Benchmarks du pré-traitement : débit et pic mémoire par étape, pour chaque variante du script.
+
+Variantes mesurées sur le même export synthétique (benchmarks/generate.py) :
+- pretraitement_semrush : chaîne actuelle (pipeline.py, BrandMatcher) ;
+- pretraitement_semrushV05062025 : boucles d'origine (is_branded_kw lue dans le script, iterrows),
+  limitées à --legacy-max-rows lignes car quadratiques en nombre de marques ;
+- app.py : nettoyage, détection des marques et filtres de l'application WordCloud.
+
+Chaque exécution est enregistrée en JSON dans benchmarks/results/ ; --compare affiche le rapport
+des durées avec une exécution précédente.
+
+    python benchmarks/run.py --rows 1000000 --brands 5000
+    python benchmarks/run.py --rows 1000000 --brands 5000 --compare benchmarks/results/<précédent>.json
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from brand_matcher import BrandMatcher, normalize_brands  # noqa: E402
+from generate import make_brands, write_export  # noqa: E402
+from normalization import dedup_keys  # noqa: E402
+from pipeline import (  # noqa: E402
+    DOWNLOAD_COLUMNS, add_classification_columns, aggregate, classify_frames, prepare_frame, read_semrush,
+    slice_classification, synthese_from_aggregate
+)
+
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+LEGACY_SCRIPT = os.path.join(REPO_DIR, "pretraitement_semrushV05062025.py")
+
+
+class StageRecorder:
+    """Durée (et pic mémoire Python si tracemalloc est actif) de chaque étape d'une variante."""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Mesure le bloc ; rows peut être renseigné dans le dict renvoyé quand il n'est connu qu'après."""
+        entry = self.stages.setdefault(name, {"rows": rows})
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield entry
+        elapsed = time.perf_counter() - start
+        rows = entry["rows"]
+        if self.trace_memory:
+            entry["peak_bytes"] = tracemalloc.get_traced_memory()[1] - baseline
+        else:
+            entry["seconds"] = round(elapsed, 4)
+            entry["rows_per_second"] = round(rows / elapsed) if elapsed else None
+
+
+def _legacy_function(name):
+    # Fonction définie au niveau module du script d'origine, sans exécuter son code Streamlit
+    with open(LEGACY_SCRIPT, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    node = next(n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name == name)
+    namespace = {"re": re}
+    exec(compile(ast.Module(body=[node], type_ignores=[]), LEGACY_SCRIPT, "exec"), namespace)
+    return namespace[name]
+
+
+def bench_current(path, brands, min_volume, max_kd, rec, max_rows=None):
+    """Chaîne actuelle de pretraitement_semrush.py (mode normal, un fichier)."""
+    with rec.stage("load") as entry:
+        df = read_semrush(path)
+        rows = entry["rows"] = len(df)
+    with rec.stage("normalize", rows):
+        df = prepare_frame(df, "Bench")
+    with rec.stage("build_matcher", len(brands)):
+        matcher = BrandMatcher(normalize_brands(brands))
+    with rec.stage("classify", rows):
+        classification, _ = classify_frames([df], matcher)
+    with rec.stage("reason_category", rows):
+        add_classification_columns(df, slice_classification(classification, slice(0, rows)), min_volume, max_kd)
+    with rec.stage("summary", rows):
+        synthese_from_aggregate(aggregate(df))
+    with rec.stage("export", rows):
+        df[[c for c in DOWNLOAD_COLUMNS if c in df.columns]].to_csv(os.devnull, index=False)
+    return rows
+
+
+def bench_legacy(path, brands, min_volume, max_kd, rec, max_rows=None):
+    """Boucles de pretraitement_semrushV05062025.py (is_branded_kw par ligne, iterrows)."""
+    is_branded_kw = _legacy_function("is_branded_kw")
+    brand_set = set(brands)
+    with rec.stage("load") as entry:
+        df = pd.read_csv(path, nrows=max_rows)
+        rows = entry["rows"] = len(df)
+    with rec.stage("normalize", rows):
+        df['Search Volume'] = pd.to_numeric(df['Search Volume'], errors='coerce').fillna(0)
+        df['Keyword Difficulty'] = pd.to_numeric(df['Keyword Difficulty'], errors='coerce').fillna(0)
+        df['Fichier'] = "Bench"
+    with rec.stage("classify", rows):
+        branded_col = ["VRAI" if is_branded_kw(kw, brand_set) else "FAUX" for kw in df['Keyword']]
+        idx_kw = df.columns.get_loc('Keyword')
+        df.insert(idx_kw + 1, 'branded', branded_col)
+    with rec.stage("reason_category", rows):
+        reason_col = []
+        for _, row in df.iterrows():
+            if row['branded'] == "VRAI":
+                branded_word = next((brand for brand in brand_set if brand.lower() in row['Keyword'].lower()), None)
+                reason_col.append(branded_word if branded_word else "Unknown Brand")
+            elif row['Keyword Difficulty'] > max_kd:
+                reason_col.append("Hard KD")
+            elif row['Search Volume'] < min_volume:
+                reason_col.append("Low Volume")
+            else:
+                reason_col.append("non_Branded")
+        df.insert(idx_kw + 2, 'reason', reason_col)
+        category_col = []
+        for _, row in df.iterrows():
+            if row['Search Volume'] < min_volume:
+                category_col.append("Low Volume")
+            elif row['Keyword Difficulty'] > max_kd:
+                category_col.append("Hard KD")
+            else:
+                category_col.append("")
+        df.insert(idx_kw + 3, 'Category', category_col)
+    with rec.stage("summary", rows):
+        mask_category_empty = (df['Category'] == "")
+        mask_branded = df['branded'] == "VRAI"
+        ((mask_category_empty) & (mask_branded)).sum()
+        ((mask_category_empty) & (~mask_branded)).sum()
+        (df['Category'] == "Hard KD").sum()
+        (df['Category'] == "Low Volume").sum()
+    with rec.stage("export", rows):
+        df.to_csv(os.devnull, index=False)
+    return rows
+
+
+def bench_app(path, brands, min_volume, max_kd, rec, max_rows=None):
+    """Nettoyage, marques et filtres de app.py (colonnes Volume / KD de l'export « Keyword Overview »)."""
+    with rec.stage("load") as entry:
+        df = pd.read_csv(path, nrows=max_rows).rename(columns={"Search Volume": "Volume", "Keyword Difficulty": "KD"})
+        rows = entry["rows"] = len(df)
+    with rec.stage("normalize", rows):
+        df.dropna(subset=['Keyword'], inplace=True)
+        df = df[~dedup_keys(df['Keyword']).duplicated().to_numpy()]
+        df['Volume'] = pd.to_numeric(df['Volume'], errors='coerce')
+        df['KD'] = pd.to_numeric(df['KD'], errors='coerce')
+        df.dropna(subset=['Volume', 'KD'], inplace=True)
+        df['Keyword'] = df['Keyword'].astype(str).str.lower().str.strip()
+        df['word_count'] = df['Keyword'].str.split().str.len()
+    with rec.stage("build_matcher", len(brands)):
+        matcher = BrandMatcher(brands, short_whole_word=False, normalize=str.lower)
+    with rec.stage("classify", len(df)):
+        df['Branded'] = matcher.is_branded_many(df['Keyword'])
+    with rec.stage("filter", len(df)):
+        terms_to_exclude = ['free', 'torrent', 'crack', 'pirate', 'illegal', 'mp3', 'streaming', 'download', 'youtube']
+        df_filtered = df[
+            (df['Volume'] >= min_volume) &
+            (df['KD'] <= max_kd) &
+            (df['word_count'] >= 2) &
+            (~df['Keyword'].str.contains('|'.join(terms_to_exclude), case=False, na=False)) &
+            (~df['Branded'])
+        ]
+    with rec.stage("export", len(df_filtered)):
+        df_filtered.to_csv(os.devnull, index=False)
+    return rows
+
+
+VARIANTS = {
+    "pretraitement_semrush": bench_current,
+    "pretraitement_semrushV05062025": bench_legacy,
+    "app.py": bench_app,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset(rows, n_brands, seed):
+    """Export synthétique et liste de marques, générés une fois puis réutilisés depuis benchmarks/data."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"semrush_{rows}_{n_brands}_{seed}.csv")
+    brands = make_brands(n_brands, seed=seed)
+    if not os.path.exists(path):
+        write_export(path + ".tmp", rows, brands, seed=seed)
+        os.replace(path + ".tmp", path)
+    return path, brands
+
+
+def run_variant(func, path, brands, min_volume, max_kd, max_rows, trace_memory):
+    """Une passe chronométrée, puis (si trace_memory) une passe sous tracemalloc pour les pics mémoire."""
+    timing = StageRecorder()
+    rows = func(path, brands, min_volume, max_kd, timing, max_rows)
+    stages = timing.stages
+    if trace_memory:
+        memory = StageRecorder(trace_memory=True)
+        tracemalloc.start()
+        try:
+            func(path, brands, min_volume, max_kd, memory, max_rows)
+        finally:
+            tracemalloc.stop()
+        for name, entry in memory.stages.items():
+            stages[name]["peak_bytes"] = entry["peak_bytes"]
+    total = sum(entry["seconds"] for entry in stages.values())
+    return {"rows": rows, "total_seconds": round(total, 4), "stages": stages}
+
+
+def compare(current, previous):
+    """Tableau des durées (s) par variante et par étape, avec le rapport actuel / précédent."""
+    lines = []
+    for variant, result in current["variants"].items():
+        before = previous.get("variants", {}).get(variant)
+        if before is None:
+            continue
+        for stage, entry in result["stages"].items():
+            old = before["stages"].get(stage, {}).get("seconds")
+            ratio = f"{entry['seconds'] / old:.2f}x" if old else "-"
+            lines.append(f"{variant:32} {stage:16} {old if old is not None else '-':>10} {entry['seconds']:>10} {ratio:>8}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Débit et pic mémoire par étape pour chaque variante du script.")
+    parser.add_argument("--rows", type=int, default=100_000, help="lignes de l'export synthétique (jusqu'à 10M)")
+    parser.add_argument("--brands", type=int, default=1_000, help="taille de la liste de marques (10 à 50k)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-volume", type=int, default=100)
+    parser.add_argument("--max-kd", type=int, default=50)
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--legacy-max-rows", type=int, default=5_000,
+                        help="lignes traitées par la variante V05062025 (boucles par ligne et par marque)")
+    parser.add_argument("--no-memory", action="store_true", help="ne pas mesurer les pics mémoire (passe tracemalloc)")
+    parser.add_argument("--output", help="fichier JSON des résultats (défaut : benchmarks/results/<date>.json)")
+    parser.add_argument("--compare", help="résultats JSON d'une exécution précédente à comparer")
+    args = parser.parse_args(argv)
+
+    path, brands = dataset(args.rows, args.brands, args.seed)
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "params": {
+            "rows": args.rows, "brands": args.brands, "seed": args.seed,
+            "min_volume": args.min_volume, "max_kd": args.max_kd, "legacy_max_rows": args.legacy_max_rows,
+        },
+        "variants": {},
+    }
+    for variant in args.variants:
+        max_rows = args.legacy_max_rows if variant == "pretraitement_semrushV05062025" else None
+        result = run_variant(
+            VARIANTS[variant], path, brands, args.min_volume, args.max_kd, max_rows, not args.no_memory
+        )
+        results["variants"][variant] = result
+        print(f"{variant}: {result['rows']} lignes, {result['total_seconds']} s")
+        for stage, entry in result["stages"].items():
+            peak = f"{entry['peak_bytes'] / 2 ** 20:9.1f} Mo" if "peak_bytes" in entry else ""
+            print(f"  {stage:16} {entry['seconds']:10.4f} s {entry['rows_per_second'] or 0:>12} lignes/s {peak}")
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + f"_{args.rows}x{args.brands}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Résultats : {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(compare(results, json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
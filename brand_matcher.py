@@ -0,0 +1,349 @@
+"""Détection des mots-clés branded : automate Aho-Corasick construit une fois par liste de marques."""
+import hashlib
+import multiprocessing
+import pickle
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    # Automate compilé en C (pyahocorasick), utilisé s'il est installé
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+from fuzzy_index import FuzzyBrandIndex
+from normalization import WORD_SYMBOLS, normalize_text
+
+# Les marques de 3 caractères ou moins ("us", "uk", "ny"...) doivent correspondre à un mot entier,
+# les plus longues sont recherchées comme sous-chaîne.
+SHORT_BRAND_MAX_LEN = 3
+
+
+def _is_word_char(ch):
+    # \w de re pour les chaînes unicode, plus les symboles gardés dans les mots par la forme canonique
+    return ch.isalnum() or ch == "_" or ch in WORD_SYMBOLS
+
+
+def _is_boundary(text, pos):
+    # Équivalent de \b : changement mot / non-mot à la position pos
+    before = pos > 0 and _is_word_char(text[pos - 1])
+    after = pos < len(text) and _is_word_char(text[pos])
+    return before != after
+
+
+def normalize_brands(brands):
+    """Liste canonique des marques : forme normalisée, sans doublon et triée.
+
+    Les variantes d'accents ("algerie" / "algérie") se confondent en une seule marque.
+    """
+    return tuple(sorted({normalize_text(b) for b in brands} - {""}))
+
+
+def brand_list_key(brands):
+    """Empreinte du contenu de la liste de marques, indépendante de l'ordre et de la casse."""
+    digest = hashlib.sha256()
+    for brand in normalize_brands(brands):
+        digest.update(brand.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# En dessous de ce nombre de mots-clés distincts, le pool coûte plus qu'il ne rapporte. Mesure
+# (benchmarks/generate.py, 1000 marques) : 1,4 µs par mot-clé en séquentiel, 0,15 à 0,5 µs de transfert
+# par mot-clé et ~6 ms par appel sur un pool déjà démarré (le démarrage lui-même coûte ~1,2 s, une fois).
+PARALLEL_MIN_KEYWORDS = 1_000_000
+# Nombre de paquets par processus : équilibre la charge sans multiplier les échanges
+CHUNKS_PER_WORKER = 4
+
+# Automates déjà reçus par un processus du pool, par empreinte (le pool sert pour plusieurs listes de marques)
+_worker_matchers = {}
+WORKER_MATCHERS_KEPT = 4
+
+
+def make_worker_pool(workers):
+    """Pool de processus à créer une fois et à garder (st.cache_resource, durée d'une commande...).
+
+    Les processus ne démarrent qu'au premier paquet soumis : un pool qui ne sert pas (moins de
+    PARALLEL_MIN_KEYWORDS mots-clés distincts) ne coûte rien.
+    """
+    # spawn : pas de fork d'un serveur Streamlit multi-thread
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _run_chunk(task):
+    key, payload, method, texts = task
+    matcher = _worker_matchers.get(key)
+    if matcher is None:
+        matcher = pickle.loads(payload)
+        if len(_worker_matchers) >= WORKER_MATCHERS_KEPT:
+            _worker_matchers.pop(next(iter(_worker_matchers)))
+        _worker_matchers[key] = matcher
+    func = getattr(matcher, method)
+    return [func(text) for text in texts]
+
+
+# Résultat d'une classification de colonne : masque branded et marque trouvée (None sinon)
+Classification = namedtuple("Classification", ["branded", "brands"])
+
+
+def broadcast(found, codes):
+    """Classification par ligne à partir des marques trouvées par mot-clé distinct."""
+    branded = np.fromiter((b is not None for b in found), dtype=bool, count=len(found))
+    return Classification(branded[codes], found[codes])
+
+
+class BrandMatcher:
+    """Automate multi-motifs : un seul passage par mot-clé, quel que soit le nombre de marques.
+
+    Avec max_distance > 0, les mots-clés sans correspondance exacte sont ensuite comparés
+    aux marques avec tolérance aux fautes de frappe (voir fuzzy_index).
+    Avec short_whole_word=False, toutes les marques sont cherchées comme sous-chaîne ; normalize
+    fixe la forme des marques (str.lower pour une simple comparaison en minuscules, comme app.py).
+    """
+
+    def __init__(self, brands, max_distance=0, short_whole_word=True, normalize=normalize_text):
+        # Normalisation des marques une seule fois (et non plus à chaque mot-clé)
+        seen = {}
+        for brand in brands:
+            brand = normalize(str(brand))
+            if brand and brand not in seen:
+                seen[brand] = len(seen)
+        self.brands = tuple(seen)
+        self.short_whole_word = short_whole_word
+        self._short = tuple(short_whole_word and len(b) <= SHORT_BRAND_MAX_LEN for b in self.brands)
+        self.max_distance = max_distance
+        self._fuzzy = FuzzyBrandIndex(self.brands, max_distance) if max_distance > 0 else None
+        self._payload = None
+        self._build()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_payload"] = None
+        return state
+
+    def __len__(self):
+        return len(self.brands)
+
+    def _build(self):
+        goto = [{}]
+        outputs = [[]]
+        for idx, brand in enumerate(self.brands):
+            state = 0
+            for ch in brand:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(idx)
+
+        # Liens d'échec calculés en largeur, les sorties sont héritées du suffixe
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fallback = goto[f].get(ch, 0)
+                fail[nxt] = fallback if fallback != nxt else 0
+                outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+
+        # À position de fin égale, la marque la plus longue l'emporte ("new york" avant "york")
+        self._outputs = [
+            tuple(sorted(out, key=lambda i: -len(self.brands[i]))) for out in outputs
+        ]
+        self._goto = goto
+        self._fail = fail
+
+        self._automaton = None
+        if ahocorasick is not None and self.brands:
+            self._automaton = ahocorasick.Automaton()
+            for idx, brand in enumerate(self.brands):
+                self._automaton.add_word(brand, idx)
+            self._automaton.make_automaton()
+
+    def _accepts(self, text, idx, end, with_short=True):
+        # Les marques courtes doivent être délimitées comme un mot entier
+        if not self._short[idx]:
+            return True
+        if not with_short:
+            return False
+        return _is_boundary(text, end - len(self.brands[idx])) and _is_boundary(text, end)
+
+    def _scan_compiled(self, text, with_short):
+        best = best_end = None
+        for end, idx in self._automaton.iter(text):
+            if best_end is not None and end != best_end:
+                break
+            if self._accepts(text, idx, end + 1, with_short) and (
+                best is None or len(self.brands[idx]) > len(self.brands[best])
+            ):
+                best, best_end = idx, end
+        return None if best is None else (best, best_end + 1)
+
+    def _scan(self, text, with_short=True):
+        # Première marque exacte (numéro, position de fin), ou None
+        if self._automaton is not None:
+            return self._scan_compiled(text, with_short)
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for idx in outputs[state]:
+                if self._accepts(text, idx, pos + 1, with_short):
+                    return idx, pos + 1
+        return None
+
+    def _scan_long(self, text):
+        return self._scan(text, with_short=False)
+
+    def _find_fuzzy(self, text):
+        return self._fuzzy.find(text)
+
+    def _map(self, method, texts, pool=None):
+        # Applique une méthode à chaque texte, en parallèle par paquets sur le pool au-delà du seuil ;
+        # les résultats sont remis dans l'ordre des textes.
+        texts = list(texts)
+        workers = getattr(pool, "_max_workers", 1)
+        if pool is None or workers <= 1 or len(texts) < PARALLEL_MIN_KEYWORDS:
+            func = getattr(self, method)
+            return [func(text) for text in texts]
+        # Automate sérialisé une fois par liste de marques ; chaque processus ne le désérialise qu'une fois
+        if self._payload is None:
+            payload = pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+            self._payload = (hashlib.sha256(payload).hexdigest(), payload)
+        key, payload = self._payload
+        size = -(-len(texts) // (workers * CHUNKS_PER_WORKER))
+        tasks = [(key, payload, method, texts[i:i + size]) for i in range(0, len(texts), size)]
+        return [result for part in pool.map(_run_chunk, tasks) for result in part]
+
+    def find(self, keyword):
+        """Renvoie la première marque trouvée dans le mot-clé (forme canonique), ou None."""
+        text = str(keyword)
+        hit = self._scan(text)
+        if hit is not None:
+            return self.brands[hit[0]]
+        if self._fuzzy:
+            return self._fuzzy.find(text)
+        return None
+
+    def is_branded(self, keyword):
+        return self.find(keyword) is not None
+
+    def classify(self, keywords, pool=None):
+        """Classe toute une colonne de mots-clés canoniques en un seul passage.
+
+        Renvoie le masque branded et, pour chaque ligne, la première marque trouvée.
+        Chaque mot-clé distinct n'est analysé qu'une fois ; au-delà de PARALLEL_MIN_KEYWORDS,
+        l'analyse est répartie sur les processus de pool (voir make_worker_pool).
+        """
+        if hasattr(keywords, "to_pandas"):
+            # Tableau Arrow (pyarrow.Array / ChunkedArray)
+            keywords = keywords.to_pandas()
+        codes, uniques = pd.factorize(pd.Series(keywords, dtype=object), use_na_sentinel=False)
+        found = np.fromiter(self._map("find", uniques, pool), dtype=object, count=len(uniques))
+        return broadcast(found, codes)
+
+    def classify_index(self, token_index, pool=None):
+        """Même résultat que classify, pour les mots-clés d'un index inversé (token_index.TokenIndex)."""
+        return broadcast(self.find_index(token_index, pool), token_index.codes)
+
+    def find_index(self, token_index, pool=None):
+        """Marque trouvée pour chaque mot-clé distinct de l'index (None sinon).
+
+        L'automate ne cherche que les marques longues ; chaque marque courte (mot entier)
+        ne touche que les mots-clés qui contiennent ses mots, trouvés dans l'index.
+        """
+        keywords = token_index.keywords
+        found = np.full(len(keywords), None, dtype=object)
+        ends = np.full(len(keywords), np.iinfo(np.int64).max, dtype=np.int64)
+        lengths = np.zeros(len(keywords), dtype=np.int64)
+        for i, hit in enumerate(self._map("_scan_long", keywords, pool)):
+            if hit is not None:
+                found[i] = self.brands[hit[0]]
+                ends[i] = hit[1]
+                lengths[i] = len(found[i])
+
+        padded = " " + pd.Series(keywords, dtype=object) + " "
+        for brand, short in zip(self.brands, self._short):
+            if not short:
+                continue
+            ids = token_index.lookup_all(brand.split(" "))
+            if not len(ids):
+                continue
+            # Position du mot entier : même règle de priorité que l'automate (fin la plus tôt, puis la plus longue)
+            starts = padded.iloc[ids].str.find(f" {brand} ").to_numpy(dtype=np.int64)
+            ids, brand_ends = ids[starts >= 0], starts[starts >= 0] + len(brand)
+            better = (brand_ends < ends[ids]) | ((brand_ends == ends[ids]) & (len(brand) > lengths[ids]))
+            ids = ids[better]
+            found[ids] = brand
+            ends[ids] = brand_ends[better]
+            lengths[ids] = len(brand)
+
+        if self._fuzzy:
+            missing = np.flatnonzero(lengths == 0)
+            found[missing] = np.fromiter(
+                self._map("_find_fuzzy", keywords[missing], pool), dtype=object, count=len(missing)
+            )
+        return found
+
+    def candidate_ids(self, token_index):
+        """Mots-clés distincts de l'index pouvant contenir une de ces marques (sur-ensemble).
+
+        Marques courtes : intersection des listes de l'index. Marques longues : un mot du
+        mot-clé contient forcément le plus long morceau de la marque, cherché dans le vocabulaire
+        (bien plus petit que la liste des mots-clés). Mode approché : mots du vocabulaire proches
+        d'un mot de marque.
+        """
+        ids = [np.empty(0, dtype=np.int64)]
+        pieces = []
+        for brand, short in zip(self.brands, self._short):
+            if short:
+                ids.append(token_index.lookup_all(brand.split(" ")))
+            else:
+                pieces.append(max(brand.split(" "), key=len))
+        if pieces:
+            # Un seul passage d'automate sur le vocabulaire pour tous les morceaux (sous-chaînes)
+            vocabulary = np.asarray(list(token_index.tokens), dtype=object)
+            contains = BrandMatcher(pieces, short_whole_word=False, normalize=str).is_branded_many(vocabulary)
+            ids.extend(token_index.lookup(token) for token in vocabulary[contains])
+        if self._fuzzy:
+            ids.extend(token_index.lookup(token) for token in token_index.tokens if self._fuzzy.lookup(token))
+        return np.unique(np.concatenate(ids))
+
+    def refind_index(self, token_index, previous_found, previous_brands, pool=None):
+        """Met à jour find_index après une modification de la liste de marques.
+
+        Seuls les mots-clés touchés par le changement sont réévalués : ceux dont la marque a été
+        retirée et ceux qui peuvent contenir une marque ajoutée. Les autres gardent leur marque,
+        qui reste la première trouvée puisqu'aucune marque ajoutée n'y figure.
+        """
+        added = set(self.brands) - set(previous_brands)
+        removed = set(previous_brands) - set(self.brands)
+        found = previous_found.copy()
+        affected = [np.flatnonzero(pd.Series(found, dtype=object).isin(removed).to_numpy())] if removed else []
+        if added:
+            # Marques déjà sous leur forme finale : mêmes options, sans nouvelle normalisation
+            added = BrandMatcher(sorted(added), self.max_distance, self.short_whole_word, normalize=str)
+            affected.append(added.candidate_ids(token_index))
+        if not affected:
+            return found
+        affected = np.unique(np.concatenate(affected))
+        found[affected] = np.fromiter(
+            self._map("find", token_index.keywords[affected], pool), dtype=object, count=len(affected)
+        )
+        return found
+
+    def is_branded_many(self, keywords, pool=None):
+        """Masque branded (tableau NumPy de booléens) pour une Series ou un tableau Arrow de mots-clés canoniques."""
+        return self.classify(keywords, pool).branded
@@ -0,0 +1,122 @@
+"""Index de marques tolérant aux fautes de frappe (dictionnaire de suppressions façon SymSpell)."""
+from itertools import combinations
+
+# Distance d'édition autorisée selon la longueur de la marque : les marques courtes restent exactes
+# ("oman" ne doit pas attraper "roman"), les longues acceptent davantage de fautes ("minesota").
+FUZZY_MIN_LENGTH = 6
+FUZZY_LONG_LENGTH = 9
+
+# Au-delà, le mémo des mots déjà résolus est vidé pour borner la mémoire
+_MEMO_MAX_SIZE = 500_000
+
+
+def allowed_distance(term, max_distance):
+    # Distance autorisée pour un mot de marque, selon sa longueur
+    if len(term) < FUZZY_MIN_LENGTH:
+        return 0
+    if len(term) < FUZZY_LONG_LENGTH:
+        return min(1, max_distance)
+    return min(2, max_distance)
+
+
+def _deletes(term, distance):
+    # Toutes les variantes obtenues en supprimant jusqu'à `distance` caractères
+    variants = {term}
+    for n in range(1, min(distance, len(term)) + 1):
+        for positions in combinations(range(len(term)), n):
+            variants.add("".join(ch for i, ch in enumerate(term) if i not in positions))
+    return variants
+
+
+def edit_distance(a, b, limit):
+    """Distance de Damerau-Levenshtein restreinte, abandonnée dès qu'elle dépasse limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class FuzzyBrandIndex:
+    """Retrouve une marque à une distance d'édition près, sans comparer chaque paire mot-clé / marque.
+
+    Les mots des marques (forme canonique) sont indexés une fois par leurs variantes à suppressions.
+    Chaque mot distinct des mots-clés n'interroge l'index qu'une fois (mémo), puis les marques de
+    plusieurs mots sont vérifiées sur les mots consécutifs.
+    """
+
+    def __init__(self, brands, max_distance=1):
+        self.max_distance = max_distance
+        self._deletes = {}
+        self._allowed = {}
+        self._by_first = {}
+        for brand in brands:
+            tokens = tuple(brand.split(" "))
+            self._by_first.setdefault(tokens[0], []).append(tokens)
+            for token in tokens:
+                if token in self._allowed:
+                    continue
+                distance = allowed_distance(token, max_distance)
+                self._allowed[token] = distance
+                for variant in _deletes(token, distance):
+                    self._deletes.setdefault(variant, []).append(token)
+        self._memo = {}
+
+    def __bool__(self):
+        return any(self._allowed.values())
+
+    def lookup(self, token):
+        """Mots de marque à distance autorisée de token : {mot de marque: distance}."""
+        found = self._memo.get(token)
+        if found is not None:
+            return found
+        found = {}
+        if token in self._allowed:
+            found[token] = 0
+        if len(token) >= FUZZY_MIN_LENGTH - self.max_distance:
+            for variant in _deletes(token, self.max_distance):
+                for brand_token in self._deletes.get(variant, ()):
+                    if brand_token in found:
+                        continue
+                    limit = self._allowed[brand_token]
+                    distance = edit_distance(token, brand_token, limit)
+                    if distance <= limit:
+                        found[brand_token] = distance
+        if len(self._memo) >= _MEMO_MAX_SIZE:
+            self._memo.clear()
+        self._memo[token] = found
+        return found
+
+    def find(self, keyword):
+        """Première marque approchée trouvée dans un mot-clé canonique, ou None."""
+        matches = [self.lookup(token) for token in str(keyword).split(" ")]
+        for start, first in enumerate(matches):
+            best, best_distance = None, self.max_distance + 1
+            for brand_token, distance in first.items():
+                for tokens in self._by_first.get(brand_token, ()):
+                    total = distance
+                    for offset in range(1, len(tokens)):
+                        if start + offset >= len(matches) or tokens[offset] not in matches[start + offset]:
+                            total = None
+                            break
+                        total += matches[start + offset][tokens[offset]]
+                    if total is None:
+                        continue
+                    # À distance égale, l'ordre alphabétique départage : le résultat ne dépend pas de
+                    # l'ordre des ensembles de variantes (hachage propre à chaque processus)
+                    name = " ".join(tokens)
+                    if total < best_distance or (best is not None and total == best_distance and name < best):
+                        best, best_distance = name, total
+            if best is not None:
+                return best
+        return None
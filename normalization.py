@@ -0,0 +1,58 @@
+"""Forme canonique des mots-clés et des marques : minuscules, sans accents, mots séparés par un espace."""
+import re
+import unicodedata
+
+import pandas as pd
+
+# Nom de la colonne canonique ajoutée à chaque fichier chargé
+NORM_COLUMN = "keyword_norm"
+
+# Diacritiques isolés par la décomposition NFKD ("é" -> "e" + accent)
+_COMBINING_MARKS = r"[\u0300-\u036f]"
+# Symboles qui font partie du nom et restent dans les mots ("c++", "c#", "at&t") : sans eux, ces marques
+# se réduiraient à une ou deux lettres ("c", "at t") trouvées dans des mots-clés sans rapport
+WORD_SYMBOLS = "+#&"
+# Tout le reste de ce qui n'est pas un caractère de mot sépare deux mots ("w.y." -> "w y", "d'ivoire" -> "d ivoire")
+_SEPARATORS = r"(?:[^\w" + re.escape(WORD_SYMBOLS) + r"]|_)+"
+
+_COMBINING_RE = re.compile(_COMBINING_MARKS)
+_SEPARATORS_RE = re.compile(_SEPARATORS)
+
+
+def normalize_text(text):
+    """Forme canonique d'une chaîne isolée (marques, saisie utilisateur)."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = _COMBINING_RE.sub("", text)
+    return _SEPARATORS_RE.sub(" ", text).strip()
+
+
+def normalize_keywords(keywords):
+    """Forme canonique de toute une colonne, en opérations vectorisées.
+
+    Donne le même résultat que normalize_text appliqué ligne par ligne.
+    """
+    # dtype objet : les expressions régulières restent celles de re (\w unicode), quel que soit le moteur de chaînes
+    keywords = pd.Series(keywords, dtype=object).fillna("").astype(str).astype(object)
+    return (
+        keywords.str.lower()
+        .str.normalize("NFKD")
+        .str.replace(_COMBINING_MARKS, "", regex=True)
+        .str.replace(_SEPARATORS, " ", regex=True)
+        .str.strip()
+    )
+
+
+def dedup_keys(keywords):
+    """Clé de dédoublonnage : minuscules, sans accents, espaces réduits, ponctuation et symboles conservés.
+
+    Plus fidèle que la forme canonique, qui confond "e-commerce" et "e commerce".
+    """
+    keywords = pd.Series(keywords, dtype=object).fillna("").astype(str).astype(object)
+    return (
+        keywords.str.lower()
+        .str.normalize("NFKD")
+        .str.replace(_COMBINING_MARKS, "", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
@@ -0,0 +1,97 @@
+"""Cache disque des fichiers déjà lus et typés, au format colonnes Arrow IPC.
+
+Un fichier de cache par contenu de fichier chargé (SHA-256 des octets), version du lecteur et
+sélection de colonnes : relancer le traitement avec les mêmes fichiers, même depuis une autre
+session, relit les colonnes déjà typées au lieu d'analyser à nouveau le CSV ou le classeur. Le fichier
+Arrow est ouvert en projection mémoire (pas de tampon de lecture intermédiaire), mais les colonnes sont
+copiées une fois vers pandas : le DataFrame renvoyé est modifiable et ne dépend plus du fichier.
+
+Nécessite pyarrow (déclaré dans requirements.txt) ; sans lui, le cache est désactivé.
+"""
+import hashlib
+import os
+import tempfile
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+# Dossier partagé par toutes les sessions et taille maximale avant éviction des entrées les plus anciennes
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "semrush_parse_cache")
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+_SUFFIX = ".arrow"
+
+
+class ParseCache:
+    """Fichiers Arrow IPC indexés par empreinte, bornés en taille (les moins récemment lus partent d'abord)."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def __bool__(self):
+        return pa is not None
+
+    @staticmethod
+    def key(data, *parts):
+        """Empreinte du contenu brut d'un fichier et des paramètres de lecture (version, colonnes...)."""
+        digest = hashlib.sha256(data)
+        for part in parts:
+            digest.update(repr(part).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key):
+        """DataFrame en cache pour key (colonnes copiées hors du fichier), ou None."""
+        if pa is None:
+            return None
+        path = self._path(key)
+        try:
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+            os.utime(path)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        return table.to_pandas()
+
+    def put(self, key, df):
+        """Écrit df sous key (écriture atomique), puis évince si le cache dépasse sa taille."""
+        if pa is None:
+            return
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        os.close(fd)
+        try:
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, self._path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,524 @@
+"""Étapes du pré-traitement SEMrush indépendantes de l'interface Streamlit."""
+import io
+import os
+import tempfile
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+try:
+    # Lecteur Excel compilé (python-calamine), utilisé s'il est installé
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+from brand_matcher import Classification, broadcast
+from normalization import NORM_COLUMN, normalize_keywords, normalize_text
+from profiling import StageTimer
+from token_index import TokenIndex, keywords_key
+
+# Colonnes de synthèse stockées sous des clés neutres (traduites à l'affichage)
+SYNTH_KEYS = ["kw_total", "kw_brand", "kw_nonbrand", "hard_kd", "low_volume"]
+
+# Catégories LV/HardKD stockées en catégoriel compact ("" = ni l'une ni l'autre)
+CATEGORY_DTYPE = pd.CategoricalDtype(["", "Low Volume", "Hard KD"])
+
+# Colonnes exportées, dans l'ordre souhaité
+DOWNLOAD_COLUMNS = [
+    "Keyword", "Source", "branded", "reason", "Category", "Position", "Previous position", "Search Volume",
+    "Keyword Difficulty", "URL", "CPC", "Traffic", "Traffic (%)", "Traffic Cost", "Competition",
+    "Number of Results", "Trends", "Timestamp", "SERP Features by Keyword", "Keyword Intents",
+    "Position Type", "Fichier",
+]
+
+# Schéma connu des exports SEMrush : colonnes indispensables, colonnes calculées ici,
+# et colonnes facultatives qui ne sont lues que si on les exporte
+REQUIRED_COLUMNS = ["Keyword", "Search Volume", "Keyword Difficulty"]
+COMPUTED_COLUMNS = ["branded", "reason", "Category", "Fichier"]
+OPTIONAL_COLUMNS = [c for c in DOWNLOAD_COLUMNS if c not in REQUIRED_COLUMNS + COMPUTED_COLUMNS]
+
+# Types compacts appliqués dès la lecture : entiers nullables pour les colonnes entières (valeurs
+# absentes possibles), float32 pour les fractions, float64 pour les montants (Traffic Cost)
+SEMRUSH_NUMERIC = {
+    "Search Volume": "Int32",
+    "Keyword Difficulty": "Int16",
+    "Position": "Int16",
+    "Previous position": "Int16",
+    "CPC": "float32",
+    "Traffic": "Int32",
+    "Traffic (%)": "float32",
+    "Traffic Cost": "float64",
+    "Competition": "float32",
+    "Number of Results": "Int64",
+}
+# Colonnes texte à faible cardinalité (quelques valeurs répétées sur tout le fichier)
+SEMRUSH_CATEGORICAL = ["Position Type", "Keyword Intents", "SERP Features by Keyword", "Timestamp", "URL", "Source"]
+# Valeurs vides rencontrées dans les colonnes numériques des exports
+SEMRUSH_NA_VALUES = ["n/a", "N/A", "-", ""]
+
+# Version de read_semrush/prepare_frame : à incrémenter quand leur résultat change (invalide le cache disque)
+PARSER_VERSION = 3
+
+# Clés de la table agrégée (voir aggregate)
+AGGREGATE_KEYS = ["Fichier", "branded", "Category"]
+
+# Types des fichiers chargés (ceux que renvoie st.file_uploader), par extension
+UPLOAD_TYPES = {
+    ".csv": "text/csv",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".xls": "application/vnd.ms-excel",
+}
+
+# Taille des morceaux lus en mode flux : borne la mémoire quelle que soit la taille du fichier
+STREAM_CHUNK_ROWS = 100_000
+
+
+class MissingKeywordColumn(KeyError):
+    """Le fichier chargé n'a pas de colonne 'Keyword'."""
+
+    def __init__(self, columns):
+        super().__init__(list(columns))
+        self.columns = list(columns)
+
+
+class LocalUpload(io.BytesIO):
+    """Fichier local présenté comme un fichier chargé dans Streamlit (name, type, getvalue)."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            super().__init__(f.read())
+        self.name = os.path.basename(path)
+        self.type = UPLOAD_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+def read_brand_file(source, kind):
+    """Marques d'un fichier : une par ligne ("txt") ou en première colonne sans en-tête ("xlsx", "csv")."""
+    if kind == "txt":
+        lines = source.read().decode('utf-8').splitlines()
+        return {b.strip() for b in lines if b.strip()}
+    df_brands = pd.read_excel(source, header=None) if kind == "xlsx" else pd.read_csv(source, header=None)
+    return set(df_brands[0].dropna().astype(str).str.strip())
+
+
+def display_name(upload_name):
+    # Nom du fichier sans extension et avec première lettre en majuscule
+    return upload_name.rsplit('.', 1)[0].title()
+
+
+def export_columns(selected):
+    """Colonnes exportées : indispensables et calculées, plus les facultatives sélectionnées."""
+    selected = set(selected)
+    return [c for c in DOWNLOAD_COLUMNS if c not in OPTIONAL_COLUMNS or c in selected]
+
+
+def read_semrush(source, is_csv=True, columns=None, chunksize=None):
+    """Lit un export SEMrush avec son schéma connu.
+
+    Seules les colonnes indispensables et celles de `columns` sont lues (toutes si None), les
+    colonnes numériques arrivent directement typées (SEMRUSH_NUMERIC) et les colonnes répétitives en catégoriel.
+    Si une valeur numérique inattendue fait échouer la lecture typée, le fichier est relu sans les
+    types numériques, convertis ensuite par prepare_frame. En lecture par morceaux, les colonnes
+    numériques sont toujours converties par prepare_frame (un lecteur ne peut pas être relancé).
+    Les classeurs Excel passent par read_excel_sheets.
+    """
+    keep = None if columns is None else set(REQUIRED_COLUMNS) | set(columns)
+    if not is_csv:
+        return read_excel_sheets(source, keep)
+    # En-tête complet du fichier, pour signaler les colonnes disponibles malgré le filtrage
+    header = []
+
+    def usecols(column):
+        header.append(column)
+        return column in keep
+
+    categorical = {column: "category" for column in SEMRUSH_CATEGORICAL}
+    kwargs = {
+        "usecols": None if keep is None else usecols,
+        "na_values": {column: SEMRUSH_NA_VALUES for column in SEMRUSH_NUMERIC},
+    }
+    if chunksize is not None:
+        result = pd.read_csv(source, chunksize=chunksize, dtype=categorical, **kwargs)
+    else:
+        try:
+            result = pd.read_csv(source, dtype={**categorical, **SEMRUSH_NUMERIC}, **kwargs)
+        except (ValueError, TypeError):
+            if not hasattr(source, "seek"):
+                raise
+            source.seek(0)
+            header.clear()
+            result = pd.read_csv(source, dtype=categorical, **kwargs)
+    if header and "Keyword" not in header:
+        raise MissingKeywordColumn(dict.fromkeys(header))
+    return result
+
+
+def _excel_sheets(source):
+    """Feuilles d'un classeur en DataFrames bruts (python-calamine s'il est installé, sinon openpyxl)."""
+    if python_calamine is not None:
+        return pd.read_excel(source, sheet_name=None, engine="calamine")
+    return pd.read_excel(source, sheet_name=None)
+
+
+def read_excel_sheets(source, keep=None):
+    """Toutes les feuilles d'un classeur qui ont une colonne 'Keyword', mises bout à bout.
+
+    Seules les colonnes de keep sont gardées (toutes si None) ; les colonnes numériques sont
+    converties par prepare_frame.
+    """
+    frames, first_header = [], None
+    for frame in _excel_sheets(source).values():
+        # Cellules d'en-tête vides et lignes entièrement vides (fin de feuille) ignorées
+        frame = frame.loc[:, frame.columns.notna()].dropna(how="all")
+        if first_header is None:
+            first_header = list(frame.columns)
+        if "Keyword" not in frame.columns:
+            continue
+        if keep is not None:
+            frame = frame[[column for column in frame.columns if column in keep]]
+        frames.append(frame)
+    if not frames:
+        raise MissingKeywordColumn(first_header or [])
+    df = pd.concat(frames, ignore_index=True)
+    for column in df.columns.intersection(SEMRUSH_CATEGORICAL):
+        df[column] = df[column].astype("category")
+    return df
+
+
+def prepare_frame(df, file_name):
+    """Typage des colonnes numériques, nom du fichier et forme canonique des mots-clés."""
+    if 'Keyword' not in df.columns:
+        raise MissingKeywordColumn(df.columns)
+    for column, dtype in SEMRUSH_NUMERIC.items():
+        if column in df.columns and df[column].dtype != dtype:
+            values = pd.to_numeric(df[column], errors='coerce')
+            if pd.api.types.is_integer_dtype(dtype):
+                # Cellules Excel (30.0) ou valeurs décimales inattendues : arrondies à l'entier
+                values = values.round()
+            df[column] = values.astype(dtype)
+    df['Search Volume'] = df['Search Volume'].fillna(0)
+    df['Keyword Difficulty'] = df['Keyword Difficulty'].fillna(0)
+    df['Fichier'] = file_name
+    df[NORM_COLUMN] = normalize_keywords(df['Keyword'])
+    return df
+
+
+def load_upload(upload, columns=None, cache=None, timer=None):
+    """Lit et prépare un fichier chargé : (nom affiché, DataFrame).
+
+    Avec un ParseCache, un fichier de même contenu déjà lu avec la même version du lecteur et les
+    mêmes colonnes est relu depuis le cache disque au lieu d'être analysé.
+    """
+    timer = timer or StageTimer()
+    file_name = display_name(upload.name)
+    is_csv = upload.type == "text/csv"
+    key = None
+    with timer.stage("load", file_name):
+        if cache:
+            columns_part = None if columns is None else sorted(columns)
+            key = cache.key(upload.getvalue(), PARSER_VERSION, is_csv, columns_part)
+            df = cache.get(key)
+            if df is not None:
+                df['Fichier'] = file_name
+                timer.add_rows(file_name, len(df))
+                return file_name, df
+        df = read_semrush(upload, is_csv=is_csv, columns=columns)
+    with timer.stage("normalize", file_name):
+        df = prepare_frame(df, file_name)
+    timer.add_rows(file_name, len(df))
+    if key is not None:
+        with timer.stage("load", file_name):
+            cache.put(key, df)
+    return file_name, df
+
+
+def load_uploads(uploads, columns=None, workers=None, cache=None, timer=None):
+    """Charge plusieurs fichiers en parallèle (threads : lecture et analyse des fichiers).
+
+    Renvoie (position dans uploads, résultat de load_upload ou None, exception ou None) au fil
+    des fichiers terminés ; à l'appelant de remettre les fichiers dans l'ordre.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(load_upload, upload, columns, cache, timer): i for i, upload in enumerate(uploads)}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], None if error else future.result(), error
+
+
+def add_classification_columns(df, classification, min_volume, max_kd):
+    """Ajoute branded, reason et Category à partir de la classification des lignes de df.
+
+    Priorité de reason : marque, Hard KD, Low Volume ; pour Category, Low Volume d'abord.
+    """
+    mask_branded = classification.branded
+    mask_hard_kd = df['Keyword Difficulty'].to_numpy() > max_kd
+    mask_low_volume = df['Search Volume'].to_numpy() < min_volume
+
+    df['branded'] = mask_branded
+    reason_col = np.select(
+        [mask_branded, mask_hard_kd, mask_low_volume],
+        [classification.brands, "Hard KD", "Low Volume"],
+        default="non_Branded"
+    )
+    # Insertion des colonnes à la bonne position
+    idx_kw = df.columns.get_loc('Keyword')
+    df.insert(min(idx_kw + 2, len(df.columns)), 'reason', reason_col)
+    category_col = np.select([mask_low_volume, mask_hard_kd], ["Low Volume", "Hard KD"], default="")
+    df.insert(idx_kw + 3, 'Category', pd.Categorical(category_col, dtype=CATEGORY_DTYPE))
+    return df
+
+
+def aggregate(df):
+    """Table agrégée en une seule passe groupée : lignes, volume et trafic par Fichier × branded × Category.
+
+    Synthèse, onglets par fichier, ligne TOTAL et analyse branded se lisent ensuite dans cette table
+    (quelques dizaines de lignes) au lieu de refiltrer les données.
+    """
+    values = df[AGGREGATE_KEYS].assign(
+        volume=df['Search Volume'].astype('float64'),
+        traffic=df['Traffic'].astype('float64') if 'Traffic' in df.columns else 0.0,
+    )
+    return values.groupby(AGGREGATE_KEYS, observed=True, sort=False).agg(
+        rows=('volume', 'size'), volume=('volume', 'sum'), traffic=('traffic', 'sum')
+    )
+
+
+def combine_aggregates(tables):
+    """Additionne des tables de aggregate (morceaux d'un même fichier ou fichiers différents)."""
+    return pd.concat(tables).groupby(level=AGGREGATE_KEYS, observed=True, sort=False).sum()
+
+
+def synthese_from_aggregate(table, files=None):
+    """Synthèse par fichier (Fichier + SYNTH_KEYS) ; files fixe l'ordre et garde les fichiers vides."""
+    category = np.asarray(table.index.get_level_values("Category"), dtype=object)
+    branded = table.index.get_level_values("branded").to_numpy(dtype=bool)
+    no_category = category == ""
+    rows = table["rows"].to_numpy()
+    counts = pd.DataFrame({
+        "kw_total": rows,
+        "kw_brand": np.where(no_category & branded, rows, 0),
+        "kw_nonbrand": np.where(no_category & ~branded, rows, 0),
+        "hard_kd": np.where(category == "Hard KD", rows, 0),
+        "low_volume": np.where(category == "Low Volume", rows, 0),
+    }).groupby(np.asarray(table.index.get_level_values("Fichier")), sort=False).sum()
+    if files is not None:
+        counts = counts.reindex(list(dict.fromkeys(files)), fill_value=0)
+    return synthese_frame(counts.rename_axis("Fichier").reset_index())
+
+
+def branded_from_aggregate(table):
+    """Mots-clés, volume et trafic branded / non branded par fichier, sans les seuils KD et volume."""
+    by_file = table.groupby(level=["Fichier", "branded"], sort=False).sum().unstack("branded", fill_value=0)
+    by_file = by_file.reindex(columns=pd.MultiIndex.from_product([["rows", "volume", "traffic"], [True, False]]), fill_value=0)
+    return pd.DataFrame({
+        "Fichier": by_file.index,
+        "KW_branded": by_file[("rows", True)].to_numpy(),
+        "KW_nonbranded": by_file[("rows", False)].to_numpy(),
+        "Volume_branded": by_file[("volume", True)].to_numpy(),
+        "Volume_nonbranded": by_file[("volume", False)].to_numpy(),
+        "Traffic_branded": by_file[("traffic", True)].to_numpy(),
+        "Traffic_nonbranded": by_file[("traffic", False)].to_numpy(),
+    })
+
+
+def iter_processed_chunks(source, file_name, matcher, min_volume, max_kd, columns=None,
+                          chunk_rows=STREAM_CHUNK_ROWS, timer=None):
+    """Lit un CSV par morceaux bornés et renvoie chaque morceau classé et catégorisé."""
+    timer = timer or StageTimer()
+    with timer.stage("load", file_name):
+        chunks = iter(read_semrush(source, columns=columns, chunksize=chunk_rows))
+    while True:
+        with timer.stage("load", file_name):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        with timer.stage("normalize", file_name):
+            chunk = prepare_frame(chunk.reset_index(drop=True), file_name)
+        timer.add_rows(file_name, len(chunk))
+        with timer.stage("classify", file_name):
+            classification = matcher.classify(chunk[NORM_COLUMN])
+        with timer.stage("reason_category", file_name):
+            chunk = add_classification_columns(chunk, classification, min_volume, max_kd)
+        yield chunk
+
+
+def classify_frames(frames, matcher, pool=None, previous=None):
+    """Classe une seule fois chaque mot-clé distinct de tous les fichiers.
+
+    L'index inversé numérote les mots-clés canoniques (jointure par hachage) ; le résultat couvre les
+    lignes de tous les fichiers mis bout à bout, à redistribuer avec slice_classification. previous est
+    l'état renvoyé par un appel précédent : si les mots-clés sont les mêmes, son index et son résultat
+    sont réutilisés et seuls les mots-clés touchés par les marques ajoutées ou retirées sont réévalués.
+    pool : pool de processus (brand_matcher.make_worker_pool) pour les très grandes listes de mots-clés.
+    Renvoie (classification, état).
+    """
+    all_keywords = pd.concat([df[NORM_COLUMN] for df in frames], ignore_index=True)
+    all_keywords_key = keywords_key(all_keywords)
+    if (
+        previous is not None
+        and previous["keywords_key"] == all_keywords_key
+        and previous["max_distance"] == matcher.max_distance
+    ):
+        token_index = previous["token_index"]
+        found = matcher.refind_index(token_index, previous["found"], previous["brands"], pool=pool)
+    else:
+        token_index = TokenIndex(all_keywords)
+        found = matcher.find_index(token_index, pool=pool)
+    state = {
+        "keywords_key": all_keywords_key,
+        "max_distance": matcher.max_distance,
+        "brands": matcher.brands,
+        "token_index": token_index,
+        "found": found,
+    }
+    return broadcast(found, token_index.codes), state
+
+
+def reclassify_fusion(fusion, table, state, matcher, min_volume, max_kd, pool=None):
+    """Applique une nouvelle liste de marques à une fusion déjà traitée, sans la reconstruire.
+
+    state est l'état de classify_frames pour les lignes de fusion (mêmes lignes, même ordre). Seules
+    les lignes dont la marque trouvée change sont réécrites (branded, reason ; Category ne dépend pas
+    des marques) et la table agrégée n'est corrigée que de leur contribution. fusion est modifiée en
+    place. Renvoie (table, état).
+    """
+    token_index = state["token_index"]
+    found = matcher.refind_index(token_index, state["found"], state["brands"], pool=pool)
+    new_state = {**state, "brands": matcher.brands, "found": found}
+    changed = np.flatnonzero(found != state["found"])
+    if not len(changed):
+        return table, new_state
+    rows = token_index.rows(changed)
+    # Seules les colonnes agrégées des lignes touchées sont copiées
+    columns = [c for c in AGGREGATE_KEYS + ['Search Volume', 'Traffic'] if c in fusion.columns]
+    before = aggregate(fusion[columns].iloc[rows])
+
+    brands = found[token_index.codes[rows]]
+    branded = pd.notna(brands)
+    reason = np.select(
+        [
+            branded,
+            fusion['Keyword Difficulty'].to_numpy()[rows] > max_kd,
+            fusion['Search Volume'].to_numpy()[rows] < min_volume,
+        ],
+        [brands, "Hard KD", "Low Volume"],
+        default="non_Branded"
+    )
+    new_brands = pd.Index(pd.unique(reason)).difference(fusion['reason'].cat.categories)
+    if len(new_brands):
+        fusion['reason'] = fusion['reason'].cat.add_categories(new_brands)
+    fusion.iloc[rows, fusion.columns.get_loc('branded')] = branded
+    fusion.iloc[rows, fusion.columns.get_loc('reason')] = reason
+
+    # Contribution des lignes réécrites retirée puis rajoutée ; les cases vidées disparaissent
+    table = combine_aggregates([table, aggregate(fusion[columns].iloc[rows]), -before])
+    return table[table["rows"] != 0], new_state
+
+
+def merge_frames(frames):
+    """Fichiers traités mis bout à bout, colonnes catégorielles reconstituées."""
+    fusion = pd.concat(frames, ignore_index=True)
+    # Raisons : catégoriel commun à tous les fichiers (marques + Hard KD / Low Volume / non_Branded)
+    fusion['reason'] = fusion['reason'].astype('category')
+    # Les colonnes catégorielles SEMrush de catégories différentes redeviennent du texte à la concaténation
+    for column in fusion.columns.intersection(SEMRUSH_CATEGORICAL):
+        fusion[column] = fusion[column].astype('category')
+    return fusion
+
+
+def synthese_frame(rows):
+    """Synthèse par fichier (colonnes Fichier + SYNTH_KEYS) à partir de dictionnaires de compteurs par fichier."""
+    return pd.DataFrame(rows, columns=["Fichier"] + SYNTH_KEYS)
+
+
+def slice_classification(classification, rows):
+    return Classification(classification.branded[rows], classification.brands[rows])
+
+
+def select_rows(df, files=None, branded=None, categories=None, volume=None, search="", sort_by=None, ascending=True):
+    """Positions des lignes retenues par les filtres, dans l'ordre du tri : seule une page en sera affichée.
+
+    branded : True / False / None (tous) ; volume : bornes (min, max) incluses ; search : texte cherché
+    dans le mot-clé canonique (casse et accents ignorés).
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if files:
+        mask &= df["Fichier"].isin(files).to_numpy()
+    if branded is not None:
+        mask &= df["branded"].to_numpy() == branded
+    if categories:
+        mask &= df["Category"].isin(categories).to_numpy()
+    if volume is not None:
+        search_volume = df["Search Volume"].to_numpy()
+        mask &= (search_volume >= volume[0]) & (search_volume <= volume[1])
+    search = normalize_text(search)
+    if search:
+        mask &= df[NORM_COLUMN].str.contains(search, regex=False).to_numpy(dtype=bool)
+    positions = np.flatnonzero(mask)
+    if sort_by is not None:
+        values = df[sort_by].iloc[positions].reset_index(drop=True)
+        order = values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+        positions = positions[order]
+    return positions
+
+
+# Dossier des exports du mode flux et âge au-delà duquel un export orphelin (processus arrêté
+# sans nettoyage) est supprimé à la création du suivant
+SINK_DIR = os.path.join(tempfile.gettempdir(), "semrush_exports")
+SINK_MAX_AGE = 24 * 3600
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class CsvSink:
+    """Fichier CSV sur disque alimenté morceau par morceau (colonnes fixées au départ).
+
+    Le fichier est supprimé avec l'objet (fin de session Streamlit, arrêt du processus) ; les
+    exports restés sur disque plus de SINK_MAX_AGE secondes sont purgés à chaque nouvel export.
+    """
+
+    def __init__(self, columns, directory=SINK_DIR, max_age=SINK_MAX_AGE):
+        self.columns = list(columns)
+        os.makedirs(directory, exist_ok=True)
+        self.purge(directory, max_age)
+        fd, self.path = tempfile.mkstemp(prefix="semrush_", suffix=".csv", dir=directory)
+        os.close(fd)
+        self.rows = 0
+        self._header_written = False
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+
+    @staticmethod
+    def purge(directory, max_age):
+        """Supprime les exports non modifiés ni téléchargés depuis plus de max_age secondes."""
+        limit = time.time() - max_age
+        for entry in os.scandir(directory):
+            if entry.name.startswith("semrush_") and entry.name.endswith(".csv"):
+                try:
+                    if entry.stat().st_mtime < limit:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def write(self, df):
+        df.reindex(columns=self.columns).to_csv(self.path, mode="a", header=not self._header_written, index=False)
+        self._header_written = True
+        self.rows += len(df)
+
+    def open(self):
+        return open(self.path, "rb")
+
+    def read(self):
+        """Contenu complet du fichier, lu à la demande (téléchargement différé)."""
+        os.utime(self.path)
+        with self.open() as f:
+            return f.read()
+
+    def remove(self):
+        self._finalizer()
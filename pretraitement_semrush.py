@@ -1,8 +1,20 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from io import BytesIO
 import plotly.express as px
-import re
+import os
+import uuid
+from brand_matcher import BrandMatcher, brand_list_key, make_worker_pool, normalize_brands
+from normalization import NORM_COLUMN
+from parse_cache import ParseCache
+from profiling import StageTimer
+from pipeline import (
+    OPTIONAL_COLUMNS, SYNTH_KEYS, CsvSink, MissingKeywordColumn, add_classification_columns, aggregate,
+    branded_from_aggregate, classify_frames, combine_aggregates, display_name, export_columns,
+    iter_processed_chunks, load_uploads, merge_frames, prepare_frame, read_brand_file, read_semrush,
+    reclassify_fusion, select_rows, slice_classification, synthese_frame, synthese_from_aggregate
+)
 
 # 💬 Paramètres langues et textes v10
 country_flags = {"FR": "🇫🇷", "EN": "🇺🇸"}
@@ -19,6 +31,31 @@ TEXTS = {
         "brands_list": "📝 Mots-clés branded",
         "manual_brands": "Entrez vos mots spécifiques (1 par ligne)",
         "brand_file": "📎importe un fichier de mots branded (txt, csv ou xlsx)",
+        "fuzzy_distance": "Tolérance aux fautes de frappe (distance d'édition)",
+        "workers": "Processus de classification (gros fichiers)",
+        "streaming": "Mode flux (très gros fichiers CSV, synthèse et export uniquement)",
+        "export_columns": "Colonnes SEMrush à charger et exporter",
+        "timings": "⏱️ Chronométrage du traitement",
+        "timings_stage": "Étape",
+        "timings_seconds": "Durée (s)",
+        "timings_dl": "Télécharger le chronométrage (JSON)",
+        "lazy_tabs": "Un seul onglet fichier, au choix (nombreux fichiers)",
+        "files_tab": "📁 Par fichier",
+        "pick_file": "Fichier à afficher",
+        "filter_files": "Fichiers",
+        "filter_branded": "Branded",
+        "filter_category": "Catégorie",
+        "all": "Tous",
+        "no_category": "(aucune)",
+        "search": "Rechercher un mot-clé",
+        "volume_min": "Volume min",
+        "volume_max": "Volume max",
+        "sort_by": "Trier par",
+        "sort_asc": "Croissant",
+        "sort_desc": "Décroissant",
+        "page_size": "Lignes par page",
+        "page": "Page (sur {:d})",
+        "rows_shown": "Lignes {:d} à {:d} sur {:d} retenues",
         "run": "Lancer le pré-traitement",
         "synth_title": "Synthèse par source",
         "kw_total": "KW total",
@@ -50,6 +87,31 @@ TEXTS = {
         "brands_list": "📝 Brand keywords",
         "manual_brands": "Enter specific words/brands (one per line)",
         "brand_file": "📎 import a list of branded keywords (txt, csv, xlsx)",
+        "fuzzy_distance": "Typo tolerance (edit distance)",
+        "workers": "Classification processes (large files)",
+        "streaming": "Streaming mode (very large CSV files, summary and export only)",
+        "export_columns": "SEMrush columns to load and export",
+        "timings": "⏱️ Processing timings",
+        "timings_stage": "Stage",
+        "timings_seconds": "Duration (s)",
+        "timings_dl": "Download timings (JSON)",
+        "lazy_tabs": "Single file tab with a picker (many files)",
+        "files_tab": "📁 Per file",
+        "pick_file": "File to display",
+        "filter_files": "Files",
+        "filter_branded": "Branded",
+        "filter_category": "Category",
+        "all": "All",
+        "no_category": "(none)",
+        "search": "Search a keyword",
+        "volume_min": "Min volume",
+        "volume_max": "Max volume",
+        "sort_by": "Sort by",
+        "sort_asc": "Ascending",
+        "sort_desc": "Descending",
+        "page_size": "Rows per page",
+        "page": "Page (of {:d})",
+        "rows_shown": "Rows {:d} to {:d} of {:d} matching",
         "run": "Run pre-processing",
         "synth_title": "Summary per source",
         "kw_total": "KW total",
@@ -125,27 +187,6 @@ initial_brands = [
     "Wisconsin", "WV", "WY", "Wyoming", "York", "zagreb"
 ]
 
-def is_branded_kw(keyword, brand_set):
-    # Convertir le mot-clé en minuscules
-    lower_keyword = str(keyword).lower()
-    
-    # Vérification pour chaque marque dans le set
-    for brand in brand_set:
-        brand = str(brand).strip().lower()
-        
-        # Si la marque a moins de 3 caractères, vérification avec match exact
-        if len(brand) <= 3:
-            # Utiliser une regex avec \b pour match exact du mot complet
-            if re.search(r'\b' + re.escape(brand) + r'\b', lower_keyword):
-                return True
-        else:
-            # Pour les marques plus longues, on vérifie si la marque est présente dans le texte
-            if brand in lower_keyword:
-                return True
-    
-    return False
-
-
 # Configuration Streamlit
 st.set_page_config(layout="wide")
 
@@ -176,6 +217,15 @@ with st.sidebar:
     st.write(TEXTS[langue]["brands_list"])
     brand_input = st.text_area(TEXTS[langue]["manual_brands"], height=100)
     brand_file = st.file_uploader(TEXTS[langue]["brand_file"], type=["txt", "xlsx"])
+    fuzzy_distance = st.selectbox(TEXTS[langue]["fuzzy_distance"], [0, 1, 2], index=0)
+    # Classification parallèle déclenchée automatiquement au-delà de PARALLEL_MIN_KEYWORDS mots-clés distincts
+    # (tous les processeurs par défaut ; en dessous du seuil, le pool reste sans processus démarré)
+    n_workers = st.number_input(TEXTS[langue]["workers"], min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1, step=1)
+    streaming_mode = st.checkbox(TEXTS[langue]["streaming"], value=False)
+    # Les colonnes non sélectionnées ne sont pas lues du tout (Keyword, volume et KD le sont toujours)
+    selected_columns = st.multiselect(TEXTS[langue]["export_columns"], OPTIONAL_COLUMNS, default=OPTIONAL_COLUMNS)
+    # Option d'affichage seulement : seul le fichier choisi est construit, sans relancer le traitement
+    lazy_tabs = st.checkbox(TEXTS[langue]["lazy_tabs"], value=True)
     run_btn = st.button(TEXTS[langue]["run"])
 
 # Fonction pour créer le modèle de fichier
@@ -207,6 +257,46 @@ def download_model():
 # Appel de la fonction pour télécharger le modèle
 download_model()
 
+# Automate de marques partagé entre les sessions et les relances, indexé par l'empreinte de la liste
+# (le paramètre _brands n'est pas haché par Streamlit, seule la clé compte)
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_brand_matcher(brands_key, max_distance, _brands):
+    return BrandMatcher(_brands, max_distance=max_distance)
+
+# Pool de processus de classification unique, commun à toutes les sessions : changer le nombre de
+# processus remplace le pool précédent, arrêté sans attendre (les paquets en cours se terminent)
+@st.cache_resource(max_entries=1, show_spinner=False, on_release=lambda pool: pool.shutdown(wait=False))
+def get_worker_pool(workers):
+    return make_worker_pool(workers)
+
+# Cache disque des fichiers déjà lus, commun à toutes les sessions
+@st.cache_resource(show_spinner=False)
+def get_parse_cache():
+    return ParseCache()
+
+# Panneau de chronométrage (barre latérale repliable) : durée de chaque étape, débit par fichier, export JSON
+def show_timings(timer):
+    report = timer.report()
+    with st.sidebar.expander(TEXTS[langue]["timings"], expanded=False):
+        st.dataframe(
+            pd.DataFrame(report["stages"].items(), columns=[TEXTS[langue]["timings_stage"], TEXTS[langue]["timings_seconds"]]),
+            use_container_width=True, hide_index=True
+        )
+        if report["files"]:
+            st.dataframe(pd.DataFrame(report["files"]), use_container_width=True, hide_index=True)
+        st.download_button(
+            label=TEXTS[langue]["timings_dl"],
+            data=timer.to_json(),
+            file_name="timings.json",
+            mime="application/json",
+            key="download_timings"
+        )
+
+# Libellés VRAI/FAUX (ou TRUE/FALSE) appliqués seulement à l'affichage et à l'export :
+# la colonne 'branded' reste booléenne, un changement de langue ne touche pas aux données.
+def localize_branded(df):
+    return df.assign(branded=np.where(df['branded'], TEXTS[langue]["true"], TEXTS[langue]["false"]))
+
 # Génération dynamique des couleurs
 default_colors = {
     "synthese": ["#4CAF50", "#FF9800", "#2196F3", "#F44336"],
@@ -217,192 +307,264 @@ if uploaded_files and run_btn:
     brand_set = set([b.strip() for b in brand_input.splitlines() if b.strip()]) if brand_input else set()
     if brand_file:
         if brand_file.type == "text/plain":
-            txt_lines = brand_file.read().decode('utf-8').splitlines()
-            brand_set.update([b.strip() for b in txt_lines if b.strip()])
+            brand_set.update(read_brand_file(brand_file, "txt"))
         elif brand_file.type in [
             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             "application/vnd.ms-excel"]:
-            df_brands = pd.read_excel(brand_file, header=None)
-            brand_set.update(df_brands[0].dropna().astype(str).str.strip())
+            brand_set.update(read_brand_file(brand_file, "xlsx"))
         elif brand_file.type == "text/csv":
-            df_brands = pd.read_csv(brand_file, header=None)
-            brand_set.update(df_brands[0].dropna().astype(str).str.strip())
+            brand_set.update(read_brand_file(brand_file, "csv"))
+
+    # Automate compilé une seule fois par liste de marques (réutilisé tant que la liste ne change pas)
+    brands_normalized = normalize_brands(brand_set)
+    brand_matcher = get_brand_matcher(brand_list_key(brands_normalized), fuzzy_distance, brands_normalized)
 
     progress = st.progress(0)
-    synthese = []
+    file_names = []
     all_processed = []
-
-    for i, upl in enumerate(uploaded_files):
-        try:
-            if upl.type == "text/csv":
-                df = pd.read_csv(upl)
-            else:
-                df = pd.read_excel(upl)
-            if 'Keyword' not in df.columns:
-                st.error(f"{TEXTS[langue]['error_keyword']} {list(df.columns)}")
-                continue
-            df['Search Volume'] = pd.to_numeric(df['Search Volume'], errors='coerce').fillna(0)
-            df['Keyword Difficulty'] = pd.to_numeric(df['Keyword Difficulty'], errors='coerce').fillna(0)
-
-            # Nom du fichier (sans extension et avec première lettre en majuscule)
-            file_name = upl.name.rsplit('.', 1)[0].title()  # Enlève l'extension et met en majuscule
-            df['Fichier'] = file_name  # Utiliser le nom sans extension
-
-            # Ajout de la colonne de mots-clés branded
-            branded_col = []  # On définit la liste vide ici pour éviter l'erreur
-
-            # On boucle sur chaque mot-clé dans le DataFrame
-            for kw in df['Keyword']:
-                result = is_branded_kw(kw, brand_set)
-                # Affichage pour comprendre où ça pose problème
-                print(f"Keyword: {kw} => is_branded_kw: {result}")
-                # Ajout du résultat dans la liste branded_col
-                branded_col.append(TEXTS[langue]["true"] if result else TEXTS[langue]["false"])
-
-            # On ajoute la colonne 'Branded'
-            df['branded'] = branded_col
-
-            # Ajout de la colonne des raisons
-            reason_col = []
-
-            for _, row in df.iterrows():
-                if row['branded'] == TEXTS[langue]["true"]:
-                    # Trouver le mot de marque correspondant (plus rigoureux avec regex)
-                    keyword_words = re.findall(r"\b[\w'-]+\b", row['Keyword'].lower())
-                    branded_word = next(
-                        (
-                            brand for brand in brand_set
-                            if (
-                                (len(brand) <= 3 and brand.lower() in keyword_words) or
-                                (len(brand) > 3 and brand.lower() in row['Keyword'].lower())
-                            )
-                        ),
-                        None
+    timer = StageTimer()
+    pool = get_worker_pool(n_workers) if n_workers > 1 else None
+
+    # Paramètres du traitement hors liste de marques : s'ils n'ont pas changé depuis la dernière
+    # exécution, seule la classification des lignes touchées par les marques modifiées est refaite
+    run_inputs = (tuple(upl.file_id for upl in uploaded_files), tuple(selected_columns), min_volume, max_kd, fuzzy_distance)
+    previous_results = st.session_state.get("resultats")
+    brands_only = (
+        not streaming_mode
+        and previous_results is not None
+        and previous_results.get("inputs") == run_inputs
+        and "brand_classification" in st.session_state
+    )
+
+    # Fichier d'export du mode flux précédent : remplacé à chaque exécution
+    previous_sink = st.session_state.get("resultats", {}).get("sink")
+    if previous_sink is not None:
+        previous_sink.remove()
+
+    if streaming_mode:
+        # Mode flux : chaque CSV est lu par morceaux bornés, classé, compté puis écrit sur disque ;
+        # la mémoire reste stable quelle que soit la taille des fichiers.
+        sink = CsvSink(export_columns(selected_columns))
+        tables = []
+        for i, upl in enumerate(uploaded_files):
+            file_name = display_name(upl.name)
+            n_file_rows = 0
+            try:
+                if upl.type == "text/csv":
+                    chunks = iter_processed_chunks(
+                        upl, file_name, brand_matcher, min_volume, max_kd, selected_columns, timer=timer
                     )
-                    reasoning = branded_word if branded_word else "Unknown Brand"
-                    reason_col.append(reasoning)
-                elif row['Keyword Difficulty'] > max_kd:
-                    reason_col.append("Hard KD")
-                elif row['Search Volume'] < min_volume:
-                    reason_col.append("Low Volume")
-                else:
-                    reason_col.append("non_Branded")
-
-            # Insertion de la colonne à la bonne position
-            idx_kw = df.columns.get_loc('Keyword')
-            insert_pos = min(idx_kw + 2, len(df.columns))
-            df.insert(insert_pos, 'reason', reason_col)
-
-            # Ajout de la colonne de catégorie LV/HardKD
-            category_col = []
-            for _, row in df.iterrows():
-                if row['Search Volume'] < min_volume:
-                    category_col.append("Low Volume")
-                elif row['Keyword Difficulty'] > max_kd:
-                    category_col.append("Hard KD")
                 else:
-                    category_col.append("")
-            df.insert(idx_kw + 3, 'Category', category_col)
-
-            mask_category_empty = (df['Category'] == "")
-            mask_branded = df['branded'] == TEXTS[langue]["true"]
-            mask_nonbranded = df['branded'] == TEXTS[langue]["false"]
-
-            n_total = len(df)
-            n_kwbrand = ((mask_category_empty) & (mask_branded)).sum()
-            n_kwnonbrand = ((mask_category_empty) & (mask_nonbranded)).sum()
-            n_hardkd = (df['Category'] == "Hard KD").sum()
-            n_lowvol = (df['Category'] == "Low Volume").sum()
-
-            synthese.append({
-                "Fichier": file_name,
-                TEXTS[langue]["kw_total"]: n_total,
-                TEXTS[langue]["kw_brand"]: n_kwbrand,
-                TEXTS[langue]["kw_nonbrand"]: n_kwnonbrand,
-                TEXTS[langue]["hard_kd"]: n_hardkd,
-                TEXTS[langue]["low_volume"]: n_lowvol,
-            })
+                    with timer.stage("load", file_name):
+                        df = read_semrush(upl, is_csv=False, columns=selected_columns)
+                    with timer.stage("normalize", file_name):
+                        df = prepare_frame(df, file_name)
+                    timer.add_rows(file_name, len(df))
+                    with timer.stage("classify", file_name):
+                        classification = brand_matcher.classify(df[NORM_COLUMN])
+                    with timer.stage("reason_category", file_name):
+                        chunks = [add_classification_columns(df, classification, min_volume, max_kd)]
+                for chunk in chunks:
+                    with timer.stage("summary", file_name):
+                        tables.append(aggregate(chunk))
+                    with timer.stage("export", file_name):
+                        sink.write(localize_branded(chunk))
+                    n_file_rows += len(chunk)
+                file_names.append(file_name)
+                st.write(f"✅ {upl.name}: {n_file_rows} lignes chargées")
+            except MissingKeywordColumn as e:
+                st.error(f"{TEXTS[langue]['error_keyword']} {e.columns}")
+            except Exception as e:
+                st.error(f"{TEXTS[langue]['error_parse']} {e}")
+            progress.progress(int(100 * (i + 1) / len(uploaded_files)))
+
+        # Table agrégée des morceaux de tous les fichiers, puis synthèse par fichier
+        with timer.stage("summary"):
+            table = combine_aggregates(tables) if tables else None
+            synthese = synthese_from_aggregate(table, file_names) if tables else synthese_frame([])
+        st.session_state["resultats"] = {
+            "run_id": uuid.uuid4().hex,
+            "fusion": None,
+            "n_rows": sink.rows,
+            "sink": sink,
+            "columns": export_columns(selected_columns),
+            "thresholds": (min_volume, max_kd),
+            "aggregate": table,
+            "file_rows": [],
+            "synthese": synthese,
+            "timings": timer,
+        }
+        loaded_files = []
+    elif brands_only:
+        # Fusion et table agrégée de la session mises à jour en place pour les seules lignes touchées
+        with timer.stage("classify"):
+            table, st.session_state["brand_classification"] = reclassify_fusion(
+                previous_results["fusion"], previous_results["aggregate"], st.session_state["brand_classification"],
+                brand_matcher, min_volume, max_kd, pool=pool
+            )
+        with timer.stage("summary"):
+            synthese = synthese_from_aggregate(table, list(previous_results["synthese"]["Fichier"]))
+        st.session_state["resultats"] = {
+            **previous_results,
+            "run_id": uuid.uuid4().hex,
+            "aggregate": table,
+            "synthese": synthese,
+            "timings": timer,
+        }
+        progress.progress(100)
+        loaded_files = []
+    else:
+        # 1) Chargement et normalisation des fichiers en parallèle (schéma SEMrush connu, colonnes
+        # numériques, nom du fichier et forme canonique des mots-clés), remis ensuite dans l'ordre d'envoi ;
+        # un fichier déjà lu (même contenu) est relu depuis le cache disque
+        loaded = [None] * len(uploaded_files)
+        for done, (i, result, error) in enumerate(load_uploads(uploaded_files, selected_columns, cache=get_parse_cache(), timer=timer), start=1):
+            loaded[i] = (result, error)
+            progress.progress(int(50 * done / len(uploaded_files)))
+        loaded_files = []
+        for upl, (result, error) in zip(uploaded_files, loaded):
+            if isinstance(error, MissingKeywordColumn):
+                st.error(f"{TEXTS[langue]['error_keyword']} {error.columns}")
+            elif error is not None:
+                st.error(f"{TEXTS[langue]['error_parse']} {error}")
+            else:
+                loaded_files.append((upl, *result))
+
+    # 2) Classification unique de chaque mot-clé distinct, tous fichiers confondus, redistribuée
+    # ensuite à chaque fichier par tranche de lignes. L'index et le résultat de la dernière exécution
+    # de la session sont réutilisés si les mots-clés n'ont pas changé (seules les marques ajoutées
+    # ou retirées sont alors réévaluées).
+    if loaded_files:
+        with timer.stage("classify"):
+            classification, st.session_state["brand_classification"] = classify_frames(
+                [df for _, _, df in loaded_files], brand_matcher, pool=pool,
+                previous=st.session_state.get("brand_classification")
+            )
+
+    # 3) Colonnes dérivées (branded, reason, Category) de chaque fichier ; les lignes d'un fichier
+    # restent contiguës dans la fusion (positions gardées par fichier chargé pour l'aperçu des onglets ;
+    # plusieurs fichiers peuvent porter le même nom affiché, ex. a.csv et A.csv)
+    row_offset = 0
+    fusion_offset = 0
+    file_positions = []
+    for i, (upl, file_name, df) in enumerate(loaded_files):
+        file_rows = slice(row_offset, row_offset + len(df))
+        row_offset += len(df)
+        try:
+            with timer.stage("reason_category", file_name):
+                add_classification_columns(df, slice_classification(classification, file_rows), min_volume, max_kd)
 
             all_processed.append(df)
+            file_names.append(file_name)
+            file_positions.append((file_name, fusion_offset, fusion_offset + len(df)))
+            fusion_offset += len(df)
 
-            st.write(f"✅ {upl.name}: {n_total} lignes chargées")
+            st.write(f"✅ {upl.name}: {len(df)} lignes chargées")
         except Exception as e:
             st.error(f"{TEXTS[langue]['error_parse']} {e}")
-        progress.progress(int(100 * (i + 1) / len(uploaded_files)))
+        progress.progress(50 + int(50 * (i + 1) / len(loaded_files)))
 
     if all_processed:
-        fusion = pd.concat(all_processed, ignore_index=True)
-        synthese_df = pd.DataFrame(synthese)
-
-        # Ajout de la ligne totale sans pourcentages
-        if not synthese_df.empty:
-            total_kw = synthese_df[TEXTS[langue]["kw_total"]].sum()
-            total_branded = synthese_df[TEXTS[langue]["kw_brand"]].sum()
-            total_nonbranded = synthese_df[TEXTS[langue]["kw_nonbrand"]].sum()
-            total_hardkd = synthese_df[TEXTS[langue]["hard_kd"]].sum()
-            total_lowvol = synthese_df[TEXTS[langue]["low_volume"]].sum()
-            total_row = {
-                "Fichier": TEXTS[langue]["total"],
-                TEXTS[langue]["kw_total"]: total_kw,
-                TEXTS[langue]["kw_brand"]: total_branded,
-                TEXTS[langue]["kw_nonbrand"]: total_nonbranded,
-                TEXTS[langue]["hard_kd"]: total_hardkd,
-                TEXTS[langue]["low_volume"]: total_lowvol,
-            }
-            synthese_df = pd.concat([synthese_df, pd.DataFrame([total_row])], ignore_index=True)
-
-        # Renommer la colonne "Fichier"
-        synthese_df.rename(columns={"Fichier": TEXTS[langue]["company"]}, inplace=True)
-
-        st.success(TEXTS[langue]["n_lines"].format(len(fusion)))
-
-        # Affichage par Onglets
+        fusion = merge_frames(all_processed)
+        # Une seule passe groupée sur la fusion : synthèse, onglets, TOTAL et analyse branded en découlent
+        with timer.stage("summary"):
+            table = aggregate(fusion)
+            synthese = synthese_from_aggregate(table, file_names)
+        # Résultats conservés dans la session : changer de langue ne relance pas le traitement.
+        # run_id est unique sur tout le serveur : les caches st.cache_data, indexés par run_id,
+        # sont partagés par toutes les sessions
+        st.session_state["resultats"] = {
+            "run_id": uuid.uuid4().hex,
+            "fusion": fusion,
+            "n_rows": len(fusion),
+            "sink": None,
+            # Mise à jour incrémentale possible seulement si la fusion couvre toutes les lignes classées
+            "inputs": run_inputs if len(all_processed) == len(loaded_files) else None,
+            "columns": export_columns(selected_columns),
+            "thresholds": (min_volume, max_kd),
+            "aggregate": table,
+            "file_rows": file_positions,
+            "synthese": synthese,
+            "timings": timer,
+        }
+    elif not streaming_mode and not brands_only:
+        st.session_state.pop("resultats", None)
+
+# Affichage des derniers résultats, avec les libellés de la langue courante
+resultats = st.session_state.get("resultats")
+if resultats is not None:
+    fusion = resultats["fusion"]
+    synthese_df = resultats["synthese"]
+    # Graphiques (et export hors mode flux) rechronométrés à chaque affichage
+    timer = resultats["timings"]
+    if fusion is None:
+        timer.reset("chart")
+    else:
+        timer.reset("chart", "export")
+
+    # Ajout de la ligne totale sans pourcentages
+    if not synthese_df.empty:
+        total_row = {"Fichier": TEXTS[langue]["total"], **synthese_df[SYNTH_KEYS].sum().to_dict()}
+        synthese_df = pd.concat([synthese_df, pd.DataFrame([total_row])], ignore_index=True)
+
+    # Renommer les colonnes dans la langue courante
+    synthese_df = synthese_df.rename(columns={"Fichier": TEXTS[langue]["company"], **{k: TEXTS[langue][k] for k in SYNTH_KEYS}})
+
+    st.success(TEXTS[langue]["n_lines"].format(resultats["n_rows"]))
+
+    # Affichage par Onglets (mode flux : seule la synthèse est disponible, les lignes sont sur disque)
+    if fusion is None:
+        tabs = st.tabs(["📊 " + TEXTS[langue]["synth_title"]])
+    else:
+        # Mode à la demande : un onglet unique avec sélecteur au lieu d'un onglet construit par fichier
+        file_tabs = [TEXTS[langue]["files_tab"]] if lazy_tabs else [fname.split('.')[0] for fname in resultats["synthese"]["Fichier"]]
         tabs = st.tabs(
             ["📊 " + TEXTS[langue]["synth_title"]] +
-            [fname.split('.')[0] for fname in fusion['Fichier'].unique()] +
+            file_tabs +
             [TEXTS[langue]["branded_analysis"], TEXTS[langue]["raw_data"]]
         )
 
-        # Onglet Synthèse Globale
-        with tabs[0]:
-            st.subheader("🔎 " + TEXTS[langue]["synth_title"])
-            st.dataframe(synthese_df, use_container_width=True, height=min(600, 60 + 30 * len(synthese_df)))
-
-            # Bouton de téléchargement pour la synthèse
-            @st.fragment
-            def download_synth_data():
-                st.download_button(
-                    label=TEXTS[langue]["synth_dl_label"],
-                    icon="📥",
-                    data=synthese_df.to_csv(index=False),
-                    file_name="synthese.csv",
-                    mime="text/csv",
-                    use_container_width=True,
-                    disabled=synthese_df.empty
-                )
+    # Onglet Synthèse Globale
+    with tabs[0]:
+        st.subheader("🔎 " + TEXTS[langue]["synth_title"])
+        st.dataframe(synthese_df, use_container_width=True, height=min(600, 60 + 30 * len(synthese_df)))
+
+        # Bouton de téléchargement pour la synthèse
+        @st.fragment
+        def download_synth_data():
+            st.download_button(
+                label=TEXTS[langue]["synth_dl_label"],
+                icon="📥",
+                data=synthese_df.to_csv(index=False),
+                file_name="synthese.csv",
+                mime="text/csv",
+                use_container_width=True,
+                disabled=synthese_df.empty
+            )
+
+        download_synth_data()
 
-            download_synth_data()
-
-            # Graphiques
-            synth_global_row = synthese_df[synthese_df[TEXTS[langue]["company"]] == TEXTS[langue]["total"]]
-            if not synth_global_row.empty:
-                colpie, colbar = st.columns(2)
-
-                # Graphique en camembert
-                with colpie:
-                    values = [
-                        int(synth_global_row[TEXTS[langue]["kw_nonbrand"]].values[0]),
-                        int(synth_global_row[TEXTS[langue]["kw_brand"]].values[0]),
-                        int(synth_global_row[TEXTS[langue]["hard_kd"]].values[0]),
-                        int(synth_global_row[TEXTS[langue]["low_volume"]].values[0])
-                    ]
-                    labels = [
-                        TEXTS[langue]["kw_nonbrand"],
-                        TEXTS[langue]["kw_brand"],
-                        TEXTS[langue]["hard_kd"],
-                        TEXTS[langue]["low_volume"]
-                    ]
-                    colors = default_colors["synthese"]
+        # Graphiques
+        synth_global_row = synthese_df[synthese_df[TEXTS[langue]["company"]] == TEXTS[langue]["total"]]
+        if not synth_global_row.empty:
+            colpie, colbar = st.columns(2)
+
+            # Graphique en camembert
+            with colpie:
+                values = [
+                    int(synth_global_row[TEXTS[langue]["kw_nonbrand"]].values[0]),
+                    int(synth_global_row[TEXTS[langue]["kw_brand"]].values[0]),
+                    int(synth_global_row[TEXTS[langue]["hard_kd"]].values[0]),
+                    int(synth_global_row[TEXTS[langue]["low_volume"]].values[0])
+                ]
+                labels = [
+                    TEXTS[langue]["kw_nonbrand"],
+                    TEXTS[langue]["kw_brand"],
+                    TEXTS[langue]["hard_kd"],
+                    TEXTS[langue]["low_volume"]
+                ]
+                colors = default_colors["synthese"]
+                with timer.stage("chart"):
                     fig1 = px.pie(
                         names=labels,
                         values=values,
@@ -413,134 +575,156 @@ if uploaded_files and run_btn:
                     fig1.update_traces(textinfo='percent+label')  # Affiche pourcentage + label
                     st.plotly_chart(fig1, use_container_width=True)
 
-                # Graphique en barres
-                with colbar:
-                    fig2 = px.bar(
-                        x=labels,
-                        y=values,
-                        color=labels,
-                        color_discrete_sequence=colors,
-                        title="Distribution globale"
-                    )
-                    fig2.update_traces(texttemplate='%{y}', textposition='outside')  # Affiche uniquement les valeurs
-                    st.plotly_chart(fig2, use_container_width=True)
-
-        # Onglet par fichier avec graphiques
-        for idx in range(1, len(tabs) - 2):
-            fname = fusion['Fichier'].unique()[idx - 1]  # Récupère le nom du fichier actuel
-            with tabs[idx]:
-                st.subheader(f"Analyse pour {fname}")
-
-                # Filtrer les données du fichier actuel
-                file_data = fusion[fusion["Fichier"] == fname]
-                n_total = len(file_data)
-
-                # Créer les masques
-                mask_category_empty = (file_data['Category'] == "")
-                mask_branded = file_data['branded'] == TEXTS[langue]["true"]
-                mask_nonbranded = file_data['branded'] == TEXTS[langue]["false"]
-
-                # Calculs
-                n_kwbrand = ((mask_category_empty) & (mask_branded)).sum()
-                n_kwnonbrand = ((mask_category_empty) & (mask_nonbranded)).sum()
-                n_hardkd = (file_data['Category'] == "Hard KD").sum()
-                n_lowvol = (file_data['Category'] == "Low Volume").sum()
-
-                # Créer un dictionnaire des résultats
-                results = {
-                    "Compagnie": fname,
-                    "Total": n_total,
-                    "Brand": n_kwbrand,
-                    "Non-brand": n_kwnonbrand,
-                    "Hard KD": n_hardkd,
-                    "Low Volume": n_lowvol,
-                }
-
-                # Ajouter à la synthèse pour affichage ultérieur
-                synthese.append(results)
-
-                # Créer un DataFrame pour l'affichage
-                df_synthese = pd.DataFrame([results])  # Utilisation de [results] pour créer une seule ligne
-
-                # Affichage des résultats dans un tableau
-                st.dataframe(df_synthese, use_container_width=True)  # Affichage de manière adaptée
-
-                # Graphiques
-                colpie, colbar = st.columns(2)
-                with colpie:
-                    values = [n_kwnonbrand, n_kwbrand, n_hardkd, n_lowvol]
-                    labels = [TEXTS[langue]["kw_nonbrand"], TEXTS[langue]["kw_brand"], TEXTS[langue]["hard_kd"], TEXTS[langue]["low_volume"]]
-                    colors = default_colors["synthese"]
-                    fig3 = px.pie(
-                        names=labels,
-                        values=values,
-                        color=labels,
-                        color_discrete_sequence=colors,
-                        title=f"Répartition globale des mots-clés pour {fname}"
-                    )
-                    fig3.update_traces(textinfo='percent+label')  # Affiche pourcentage + label
-
-                    # Ajustement de la taille et des marges
-                    fig3.update_layout(
-                        height=550,   # Ajuste la hauteur
-                        width=825,    # Ajuste la largeur
-                        margin=dict(t=50, b=20, l=20, r=20)  # Marges autour du graphique
-                    )
+            # Graphique en barres
+            with colbar, timer.stage("chart"):
+                fig2 = px.bar(
+                    x=labels,
+                    y=values,
+                    color=labels,
+                    color_discrete_sequence=colors,
+                    title="Distribution globale"
+                )
+                fig2.update_traces(texttemplate='%{y}', textposition='outside')  # Affiche uniquement les valeurs
+                st.plotly_chart(fig2, use_container_width=True)
 
-                    st.plotly_chart(fig3, use_container_width=True)
+    # Mode flux : export directement depuis le fichier écrit sur disque, sans DataFrame complet en mémoire ;
+    # le fichier n'est lu qu'au clic (téléchargement différé), pas à chaque affichage
+    if fusion is None:
+        with tabs[0]:
+            st.download_button(
+                label=TEXTS[langue]["dl_label"],
+                icon="📥",
+                data=resultats["sink"].read,
+                file_name=TEXTS[langue]["dl_filename"],
+                mime="text/csv",
+                use_container_width=True,
+                disabled=resultats["n_rows"] == 0
+            )
+        show_timings(timer)
+        st.stop()
+
+    # Graphiques et aperçu d'un fichier, mis en cache par exécution, fichier, seuils et langue :
+    # revenir sur un fichier déjà affiché ne reconstruit rien
+    @st.cache_data(max_entries=64, show_spinner=False)
+    def build_file_tab(run_id, fname, thresholds, langue, counts, _preview):
+        n_total, n_kwbrand, n_kwnonbrand, n_hardkd, n_lowvol = counts
+        values = [n_kwnonbrand, n_kwbrand, n_hardkd, n_lowvol]
+        labels = [TEXTS[langue]["kw_nonbrand"], TEXTS[langue]["kw_brand"], TEXTS[langue]["hard_kd"], TEXTS[langue]["low_volume"]]
+        colors = default_colors["synthese"]
+        fig3 = px.pie(
+            names=labels,
+            values=values,
+            color=labels,
+            color_discrete_sequence=colors,
+            title=f"Répartition globale des mots-clés pour {fname}"
+        )
+        fig3.update_traces(textinfo='percent+label')  # Affiche pourcentage + label
 
-                with colbar:
-                    fig4 = px.bar(
-                        x=labels,
-                        y=values,
-                        color=labels,
-                        color_discrete_sequence=colors,
-                        title=f"Distribution globale pour {fname}"
-                    )
-                    fig4.update_traces(texttemplate='%{y}', textposition='outside')  # Affiche uniquement les valeurs
-                    # Ajustement de la taille et des marges
-                    fig4.update_layout(
-                        height=550,   # Ajuste la hauteur
-                        width=500,    # Ajuste la largeur
-                        margin=dict(t=50, b=20, l=20, r=20)  # Marges autour du graphique
-                    )
+        # Ajustement de la taille et des marges
+        fig3.update_layout(
+            height=550,   # Ajuste la hauteur
+            width=825,    # Ajuste la largeur
+            margin=dict(t=50, b=20, l=20, r=20)  # Marges autour du graphique
+        )
 
-                    st.plotly_chart(fig4, use_container_width=True)
+        fig4 = px.bar(
+            x=labels,
+            y=values,
+            color=labels,
+            color_discrete_sequence=colors,
+            title=f"Distribution globale pour {fname}"
+        )
+        fig4.update_traces(texttemplate='%{y}', textposition='outside')  # Affiche uniquement les valeurs
+        # Ajustement de la taille et des marges
+        fig4.update_layout(
+            height=550,   # Ajuste la hauteur
+            width=500,    # Ajuste la largeur
+            margin=dict(t=50, b=20, l=20, r=20)  # Marges autour du graphique
+        )
+        return fig3, fig4, localize_branded(_preview)
+
+    def show_file_tab(file_counts):
+        # Compteurs du fichier lus dans la synthèse (table agrégée), sans refiltrer la fusion
+        fname = file_counts["Fichier"]
+        st.subheader(f"Analyse pour {fname}")
+        counts = tuple(int(file_counts[k]) for k in SYNTH_KEYS)
+        n_total, n_kwbrand, n_kwnonbrand, n_hardkd, n_lowvol = counts
+
+        # Créer un dictionnaire des résultats
+        results = {
+            "Compagnie": fname,
+            "Total": n_total,
+            "Brand": n_kwbrand,
+            "Non-brand": n_kwnonbrand,
+            "Hard KD": n_hardkd,
+            "Low Volume": n_lowvol,
+        }
+
+        # Affichage des résultats dans un tableau
+        st.dataframe(pd.DataFrame([results]), use_container_width=True)
+
+        # Les lignes d'un fichier chargé sont contiguës dans la fusion : l'aperçu prend les 20 premières
+        # lignes des fichiers de ce nom, dans l'ordre d'envoi (comme les compteurs, qui les regroupent)
+        preview_rows = np.concatenate([
+            np.arange(start, min(stop, start + 20)) for name, start, stop in resultats["file_rows"] if name == fname
+        ] or [np.arange(0)])[:20]
+        with timer.stage("chart"):
+            fig3, fig4, preview = build_file_tab(
+                resultats["run_id"], fname, resultats["thresholds"], langue, counts, fusion.iloc[preview_rows]
+            )
 
-                # Affichage des 20 premières lignes
-                st.write("### Aperçu des 20 premières lignes")
-                st.dataframe(file_data.head(20), use_container_width=True)
+        # Graphiques
+        colpie, colbar = st.columns(2)
+        with colpie:
+            st.plotly_chart(fig3, use_container_width=True)
+        with colbar:
+            st.plotly_chart(fig4, use_container_width=True)
+
+        # Affichage des 20 premières lignes
+        st.write("### Aperçu des 20 premières lignes")
+        st.dataframe(preview, use_container_width=True)
+
+    # Onglet(s) par fichier avec graphiques
+    if lazy_tabs:
+        with tabs[1]:
+            file_index = st.selectbox(
+                TEXTS[langue]["pick_file"], range(len(resultats["synthese"])),
+                format_func=lambda i: resultats["synthese"]["Fichier"].iloc[i].split('.')[0]
+            )
+            show_file_tab(resultats["synthese"].iloc[file_index])
+    else:
+        for idx in range(1, len(tabs) - 2):
+            with tabs[idx]:
+                show_file_tab(resultats["synthese"].iloc[idx - 1])
 
-        # Onglet Analyse Branded
-        with tabs[-2]:
-            st.write(f"### {TEXTS[langue]['branded_analysis']} sans applications de seuils KD & Volume search" if langue == "FR" else f"### {TEXTS[langue]['branded_analysis']} without applying KD & Volume Search")
+    # Onglet Analyse Branded
+    with tabs[-2]:
+        st.write(f"### {TEXTS[langue]['branded_analysis']} sans applications de seuils KD & Volume search" if langue == "FR" else f"### {TEXTS[langue]['branded_analysis']} without applying KD & Volume Search")
 
-            summary_data = fusion.groupby('Fichier').agg(
-                KW_branded=('branded', lambda x: (x == TEXTS[langue]["true"]).sum()),
-                KW_nonbranded=('branded', lambda x: (x == TEXTS[langue]["false"]).sum())
-            ).reset_index()
+        # Compteurs et volumes branded / non branded lus dans la table agrégée
+        summary_data = branded_from_aggregate(resultats["aggregate"])
 
-            # Calculer les totaux
-            total_branded = summary_data['KW_branded'].sum()
-            total_nonbranded = summary_data['KW_nonbranded'].sum()
+        # Calculer les totaux
+        total_branded = summary_data['KW_branded'].sum()
+        total_nonbranded = summary_data['KW_nonbranded'].sum()
 
-            # Créer une ligne de total
-            total_row = pd.DataFrame({
-                'Fichier': ['TOTAL'],
-                'KW_branded': [total_branded],
-                'KW_nonbranded': [total_nonbranded]
-            })
+        # Créer une ligne de total
+        total_row = pd.DataFrame({
+            'Fichier': ['TOTAL'],
+            **{col: [summary_data[col].sum()] for col in summary_data.columns if col != 'Fichier'}
+        })
 
-            # Ajouter cette ligne au DataFrame
-            df_branded_analysis = pd.concat([summary_data, total_row], ignore_index=True).rename(columns={'Fichier': TEXTS[langue]["company"]})
+        # Ajouter cette ligne au DataFrame
+        df_branded_analysis = pd.concat([summary_data, total_row], ignore_index=True).rename(columns={'Fichier': TEXTS[langue]["company"]})
 
-            # Affichage dans un tableau
-            st.dataframe(df_branded_analysis, use_container_width=True)
+        # Affichage dans un tableau
+        st.dataframe(df_branded_analysis, use_container_width=True)
 
-            # Graphique en camembert
-            pie_values = [total_nonbranded, total_branded]
-            pie_labels = ['Non-Branded', 'Branded']
+        # Graphique en camembert
+        pie_values = [total_nonbranded, total_branded]
+        pie_labels = ['Non-Branded', 'Branded']
 
+        with timer.stage("chart"):
             fig_pie = px.pie(
                 names=pie_labels,
                 values=pie_values,
@@ -561,27 +745,74 @@ if uploaded_files and run_btn:
         # Sélectionner et réorganiser les colonnes pour l'affichage
         ordered_display_columns = ["Keyword", "Source", "branded", "reason", "Category", "Position", "Previous position", "Search Volume", "Keyword Difficulty", "URL"]
 
-        # Sélectionner les colonnes pour l'affichage sans vérification
-        fusion_display_ordered = fusion[ordered_display_columns]
+        # Colonnes effectivement chargées seulement
+        display_columns = [c for c in ordered_display_columns if c in fusion.columns]
+
+        # Filtres, recherche et tri calculés côté serveur : seule la page affichée part au navigateur
+        col_files, col_branded, col_category = st.columns(3)
+        filter_files = col_files.multiselect(TEXTS[langue]["filter_files"], list(resultats["synthese"]["Fichier"]))
+        filter_branded = col_branded.selectbox(
+            TEXTS[langue]["filter_branded"], [None, True, False],
+            format_func=lambda v: TEXTS[langue]["all"] if v is None else TEXTS[langue]["true" if v else "false"]
+        )
+        filter_categories = col_category.multiselect(
+            TEXTS[langue]["filter_category"], ["", "Hard KD", "Low Volume"],
+            format_func=lambda c: c or TEXTS[langue]["no_category"]
+        )
+        col_search, col_vmin, col_vmax = st.columns([2, 1, 1])
+        search = col_search.text_input(TEXTS[langue]["search"])
+        max_volume = float(fusion["Search Volume"].max()) if len(fusion) else 0.0
+        volume_min = col_vmin.number_input(TEXTS[langue]["volume_min"], min_value=0.0, value=0.0, step=50.0)
+        volume_max = col_vmax.number_input(TEXTS[langue]["volume_max"], min_value=0.0, value=max_volume, step=50.0)
+        col_sort, col_order, col_size = st.columns(3)
+        sort_by = col_sort.selectbox(TEXTS[langue]["sort_by"], [None] + display_columns, format_func=lambda c: "—" if c is None else c)
+        ascending = col_order.radio(
+            TEXTS[langue]["sort_by"], [True, False], horizontal=True, label_visibility="hidden",
+            format_func=lambda v: TEXTS[langue]["sort_asc" if v else "sort_desc"]
+        )
+        page_size = col_size.selectbox(TEXTS[langue]["page_size"], [50, 100, 500, 1000], index=1)
+
+        # Positions des lignes retenues, mises en cache par exécution et par état des filtres : le cache
+        # est commun aux sessions, run_id (unique au serveur) empêche d'y lire les positions d'une autre fusion
+        @st.cache_data(max_entries=16, show_spinner=False)
+        def filter_raw_rows(run_id, files, branded, categories, volume, search, sort_by, ascending, _fusion):
+            return select_rows(_fusion, files, branded, categories, volume, search, sort_by, ascending)
+
+        # Bornes de volume par défaut : pas de filtre
+        volume = None if volume_min <= 0 and volume_max >= max_volume else (volume_min, volume_max)
+        rows = filter_raw_rows(
+            resultats["run_id"], tuple(filter_files), filter_branded, tuple(filter_categories), volume,
+            search, sort_by, ascending, fusion
+        )
+        n_pages = max(1, -(-len(rows) // page_size))
+        page = st.number_input(TEXTS[langue]["page"].format(n_pages), min_value=1, max_value=n_pages, value=1, step=1)
+        page_rows = rows[(page - 1) * page_size:page * page_size]
+        st.caption(TEXTS[langue]["rows_shown"].format(
+            (page - 1) * page_size + 1 if len(page_rows) else 0, (page - 1) * page_size + len(page_rows), len(rows)
+        ))
 
-        st.dataframe(fusion_display_ordered, use_container_width=True)
+        # Libellés branded de la langue courante, sur la page seulement
+        st.dataframe(localize_branded(fusion.iloc[page_rows][display_columns]), use_container_width=True)
 
         # Fonction de préparation des données pour le téléchargement
-        @st.cache_data
-        def prepare_download_data():
-            # Sélectionner toutes les colonnes pour le téléchargement dans l'ordre souhaité
-            ordered_download_columns = ["Keyword", "Source", "branded", "reason", "Category", "Position", "Previous position", "Search Volume", "Keyword Difficulty", "URL", "CPC", "Traffic", "Traffic (%)", "Traffic Cost", "Competition", "Number of Results", "Trends", "Timestamp", "SERP Features by Keyword", "Keyword Intents", "Position Type", "Fichier"]
-            
-            return fusion[ordered_download_columns].to_csv(index=False)
+        # Mise en cache par exécution (run_id unique au serveur) et par langue (le DataFrame lui-même n'est pas haché)
+        @st.cache_data(max_entries=4)
+        def prepare_download_data(run_id, langue, _fusion):
+            # Colonnes exportées choisies à l'exécution, dans l'ordre souhaité (absentes du fichier ignorées)
+            ordered_download_columns = [c for c in resultats["columns"] if c in _fusion.columns]
+
+            return localize_branded(_fusion[ordered_download_columns]).to_csv(index=False)
 
         # Fonction de téléchargement encapsulée avec st.fragment
         @st.fragment
         def download_data(page_name: str) -> None:
             page_name_better = page_name.replace("_", " ").capitalize()
+            with timer.stage("export"):
+                download_csv = prepare_download_data(resultats["run_id"], langue, fusion)  # Utiliser la fonction préparée
             st.download_button(
                 label=f"Télécharger les données de {page_name_better} au format CSV",
                 icon="📥",
-                data=prepare_download_data(),  # Utiliser la fonction préparée
+                data=download_csv,
                 file_name=f"{page_name}.csv",
                 mime="text/csv",
                 use_container_width=True,
@@ -594,3 +825,5 @@ if uploaded_files and run_btn:
         # Avertissement si les données sont vides
         if fusion.empty:
             st.warning(TEXTS[langue]["no_data"])
+
+    show_timings(timer)
@@ -0,0 +1,71 @@
+"""Chronométrage des étapes du traitement, pour suivre les régressions de performance."""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Étapes suivies, dans l'ordre du traitement
+STAGES = ("load", "normalize", "classify", "reason_category", "summary", "chart", "export")
+
+
+class StageTimer:
+    """Durées cumulées par étape et par fichier.
+
+    Les durées d'une étape s'additionnent sur tous les fichiers (et sur tous les threads de lecture).
+    Le débit d'un fichier porte sur les étapes qui lui sont attribuées : la classification faite une
+    seule fois pour tous les fichiers (mode normal) n'en fait pas partie, celle du mode flux si.
+    """
+
+    def __init__(self):
+        self.created = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.files = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, file_name=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+                if file_name is not None:
+                    self._file(file_name)["seconds"] += elapsed
+
+    def _file(self, file_name):
+        return self.files.setdefault(file_name, {"rows": 0, "seconds": 0.0})
+
+    def add_rows(self, file_name, rows):
+        with self._lock:
+            self._file(file_name)["rows"] += rows
+
+    def reset(self, *names):
+        """Remet à zéro des étapes mesurées à chaque affichage (graphiques, export)."""
+        with self._lock:
+            for name in names:
+                self.stages[name] = 0.0
+
+    def report(self):
+        """Rapport sérialisable : durées par étape (s) et débit par fichier (lignes/s)."""
+        with self._lock:
+            files = [
+                {
+                    "file": file_name,
+                    "rows": entry["rows"],
+                    "seconds": round(entry["seconds"], 4),
+                    "rows_per_second": round(entry["rows"] / entry["seconds"]) if entry["seconds"] else None,
+                }
+                for file_name, entry in self.files.items()
+            ]
+            return {
+                "created": self.created,
+                "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                "total_seconds": round(sum(self.stages.values()), 4),
+                "files": files,
+            }
+
+    def to_json(self):
+        return json.dumps(self.report(), ensure_ascii=False, indent=2)
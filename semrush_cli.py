@@ -0,0 +1,126 @@
+"""Pré-traitement SEMrush en ligne de commande (sans Streamlit), pour les traitements planifiés.
+
+Exemple :
+    python semrush_cli.py exports/ --brands marques.txt --min-volume 100 --max-kd 50 \\
+        --output fusion.parquet --summary synthese.csv
+"""
+import argparse
+import os
+import sys
+
+from brand_matcher import BrandMatcher, make_worker_pool, normalize_brands
+from parse_cache import ParseCache
+from pipeline import (
+    OPTIONAL_COLUMNS, SYNTH_KEYS, UPLOAD_TYPES, LocalUpload, add_classification_columns, aggregate,
+    classify_frames, export_columns, load_uploads, merge_frames, read_brand_file, slice_classification,
+    synthese_frame, synthese_from_aggregate
+)
+from profiling import StageTimer
+
+
+def list_exports(directory):
+    """Exports SEMrush (CSV, xlsx, xls) d'un dossier, par ordre alphabétique."""
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if os.path.splitext(name)[1].lower() in UPLOAD_TYPES
+    )
+
+
+def read_brands(path):
+    kind = {".txt": "txt", ".csv": "csv"}.get(os.path.splitext(path)[1].lower(), "xlsx")
+    with open(path, "rb") as f:
+        return read_brand_file(f, kind)
+
+
+def run(paths, brands, min_volume, max_kd, columns=None, max_distance=0, workers=1, cache=None, timer=None):
+    """Traite une liste de fichiers : (fusion ou None si aucun fichier lisible, synthèse, erreurs par fichier)."""
+    timer = timer or StageTimer()
+    matcher = BrandMatcher(normalize_brands(brands), max_distance=max_distance)
+
+    # Lecture en parallèle, remise dans l'ordre des fichiers
+    uploads = [LocalUpload(path) for path in paths]
+    loaded = [None] * len(uploads)
+    for i, result, error in load_uploads(uploads, columns, cache=cache, timer=timer):
+        loaded[i] = (result, error)
+    errors = [(upload.name, error) for upload, (_, error) in zip(uploads, loaded) if error is not None]
+    loaded_files = [result for result, error in loaded if error is None]
+    if not loaded_files:
+        return None, synthese_frame([]), errors
+
+    with timer.stage("classify"):
+        if workers > 1:
+            with make_worker_pool(workers) as pool:
+                classification, _ = classify_frames([df for _, df in loaded_files], matcher, pool=pool)
+        else:
+            classification, _ = classify_frames([df for _, df in loaded_files], matcher)
+
+    row_offset = 0
+    for file_name, df in loaded_files:
+        file_rows = slice(row_offset, row_offset + len(df))
+        row_offset += len(df)
+        with timer.stage("reason_category", file_name):
+            add_classification_columns(df, slice_classification(classification, file_rows), min_volume, max_kd)
+    fusion = merge_frames([df for _, df in loaded_files])
+    with timer.stage("summary"):
+        synthese = synthese_from_aggregate(aggregate(fusion), [file_name for file_name, _ in loaded_files])
+    return fusion, synthese, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-traitement des exports SEMrush (branded, Hard KD, Low Volume).")
+    parser.add_argument("directory", help="dossier contenant les exports SEMrush (.csv, .xlsx, .xls)")
+    parser.add_argument("--brands", required=True, help="fichier de marques (.txt une par ligne, .xlsx ou .csv en première colonne)")
+    parser.add_argument("--min-volume", type=int, default=100, help="volume minimum (défaut : 100)")
+    parser.add_argument("--max-kd", type=int, default=50, help="Keyword Difficulty maximum (défaut : 50)")
+    parser.add_argument("--output", required=True, help="fichier fusionné à écrire (.csv ou .parquet)")
+    parser.add_argument("--summary", help="synthèse par fichier à écrire en CSV (défaut : <output>_synthese.csv)")
+    parser.add_argument("--columns", nargs="*", choices=OPTIONAL_COLUMNS, metavar="COLUMN",
+                        help="colonnes SEMrush facultatives à charger et exporter (défaut : toutes)")
+    parser.add_argument("--fuzzy-distance", type=int, choices=[0, 1, 2], default=0,
+                        help="tolérance aux fautes de frappe (distance d'édition, défaut : 0)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processus de classification, utilisés automatiquement au-delà d'un million de "
+                             "mots-clés distincts (défaut : nombre de processeurs)")
+    parser.add_argument("--no-cache", action="store_true", help="ne pas utiliser le cache disque des fichiers lus")
+    parser.add_argument("--timings", help="chronométrage des étapes à écrire en JSON")
+    args = parser.parse_args(argv)
+
+    summary_path = args.summary or os.path.splitext(args.output)[0] + "_synthese.csv"
+    # Les fichiers produits peuvent être écrits dans le dossier d'entrée : ils ne sont pas relus
+    outputs = {os.path.abspath(args.output), os.path.abspath(summary_path)}
+    paths = [path for path in list_exports(args.directory) if os.path.abspath(path) not in outputs]
+    if not paths:
+        parser.error(f"aucun export SEMrush dans {args.directory}")
+    columns = OPTIONAL_COLUMNS if args.columns is None else args.columns
+
+    timer = StageTimer()
+    fusion, synthese, errors = run(
+        paths, read_brands(args.brands), args.min_volume, args.max_kd, columns=columns,
+        max_distance=args.fuzzy_distance, workers=args.workers,
+        cache=None if args.no_cache else ParseCache(), timer=timer
+    )
+    for name, error in errors:
+        print(f"{name}: {error!r}", file=sys.stderr)
+    if fusion is None:
+        return 1
+
+    with timer.stage("export"):
+        fusion = fusion[[c for c in export_columns(columns) if c in fusion.columns]]
+        if args.output.lower().endswith(".parquet"):
+            fusion.to_parquet(args.output, index=False)
+        else:
+            fusion.to_csv(args.output, index=False)
+        total_row = {"Fichier": "TOTAL", **synthese[SYNTH_KEYS].sum().to_dict()}
+        synthese.loc[len(synthese)] = total_row
+        synthese.to_csv(summary_path, index=False)
+    if args.timings:
+        with open(args.timings, "w", encoding="utf-8") as f:
+            f.write(timer.to_json())
+
+    print(synthese.to_string(index=False))
+    # Code de sortie non nul si un fichier n'a pas pu être lu (les autres sont tout de même exportés)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Détection des marques : automate, index de mots et formes canoniques."""
+import random
+import re
+
+import pytest
+
+import brand_matcher
+from brand_matcher import BrandMatcher, normalize_brands
+from fuzzy_index import allowed_distance, edit_distance
+from normalization import normalize_keywords, normalize_text
+from token_index import TokenIndex
+
+# Mots tirés au hasard : marques, marques contenues dans un autre mot ("us" / "bus", "oman" / "roman")
+# et fautes de frappe ("minesota", "halliburtn")
+WORDS = [
+    "us", "bus", "usa", "uk", "ny", "nyc", "new", "york", "newyork", "houston", "houstonian", "oman",
+    "roman", "texas", "jobs", "rig", "rigs", "offshore", "minnesota", "minesota", "baker", "hughes",
+    "total", "energies", "halliburton", "halliburtn", "schlumberger", "shlumberger", "w", "y", "salary",
+]
+BRANDS = [
+    "us", "uk", "ny", "w y", "rig", "houston", "new york", "york", "oman", "texas", "minnesota",
+    "baker hughes", "total energies", "halliburton", "schlumberger", "jobs ny", "energies",
+]
+
+
+def is_branded_kw(keyword, brand_set):
+    # Version d'origine (pretraitement_semrush.py avant l'automate), gardée comme référence
+    lower_keyword = str(keyword).lower()
+    for brand in brand_set:
+        brand = str(brand).strip().lower()
+        if len(brand) <= 3:
+            if re.search(r'\b' + re.escape(brand) + r'\b', lower_keyword):
+                return True
+        else:
+            if brand in lower_keyword:
+                return True
+    return False
+
+
+def first_brand(keyword, brands):
+    # Référence de priorité : fin la plus tôt dans le mot-clé, puis marque la plus longue
+    hits = []
+    for brand in brands:
+        if len(brand) <= brand_matcher.SHORT_BRAND_MAX_LEN:
+            match = re.search(r'\b' + re.escape(brand) + r'\b', keyword)
+            end = match.end() if match else -1
+        else:
+            start = keyword.find(brand)
+            end = start + len(brand) if start >= 0 else -1
+        if end >= 0:
+            hits.append((end, -len(brand), brand))
+    return min(hits)[2] if hits else None
+
+
+def fuzzy_brand(keyword, brands, max_distance):
+    # Référence du mode approché, par comparaison de chaque mot à chaque marque : première position
+    # où une marque commence, distance totale minimale, puis ordre alphabétique
+    tokens = keyword.split(" ")
+    for start in range(len(tokens)):
+        best = None
+        for brand in brands:
+            parts = brand.split(" ")
+            if start + len(parts) > len(tokens):
+                continue
+            total = 0
+            for part, token in zip(parts, tokens[start:]):
+                limit = allowed_distance(part, max_distance)
+                distance = edit_distance(token, part, limit)
+                if distance > limit:
+                    break
+                total += distance
+            else:
+                if total <= max_distance and (best is None or (total, brand) < best):
+                    best = (total, brand)
+        if best is not None:
+            return best[1]
+    return None
+
+
+def make_keywords(n, seed):
+    # Casse aléatoire : la version d'origine et la forme canonique passent toutes deux en minuscules
+    rng = random.Random(seed)
+    words = WORDS + [word.upper() for word in WORDS[:5]]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(1, 5))) for _ in range(n)]
+
+
+def variant(matcher, compiled):
+    # Même automate par l'extension compilée (pyahocorasick) ou en Python pur
+    if compiled and brand_matcher.ahocorasick is None:
+        pytest.skip("pyahocorasick non installé")
+    if not compiled:
+        matcher = BrandMatcher(matcher.brands, matcher.max_distance, matcher.short_whole_word, normalize=str)
+        matcher._automaton = None
+    return matcher
+
+
+@pytest.mark.parametrize("compiled", [True, False])
+@pytest.mark.parametrize("seed", range(3))
+def test_matches_original_is_branded_kw(seed, compiled):
+    rng = random.Random(seed)
+    brands = rng.sample(BRANDS, 8)
+    keywords = make_keywords(2000, seed)
+    matcher = variant(BrandMatcher(normalize_brands(brands)), compiled)
+    normalized = normalize_keywords(keywords)
+    expected = [is_branded_kw(keyword, set(brands)) for keyword in keywords]
+    assert [matcher.is_branded(keyword) for keyword in normalized] == expected
+    assert list(matcher.is_branded_many(normalized)) == expected
+    assert list(matcher.classify_index(TokenIndex(normalized)).branded) == expected
+
+
+@pytest.mark.parametrize("compiled", [True, False])
+@pytest.mark.parametrize("seed", range(3))
+def test_first_brand_earliest_end_then_longest(seed, compiled):
+    rng = random.Random(seed)
+    brands = normalize_brands(rng.sample(BRANDS, 10))
+    normalized = normalize_keywords(make_keywords(2000, seed))
+    matcher = variant(BrandMatcher(brands), compiled)
+    assert [matcher.find(keyword) for keyword in normalized] == [first_brand(keyword, brands) for keyword in normalized]
+
+
+@pytest.mark.parametrize("max_distance", [0, 1, 2])
+@pytest.mark.parametrize("seed", range(3))
+def test_find_index_matches_classify(seed, max_distance):
+    rng = random.Random(seed)
+    matcher = BrandMatcher(normalize_brands(rng.sample(BRANDS, 10)), max_distance=max_distance)
+    normalized = normalize_keywords(make_keywords(2000, seed))
+    token_index = TokenIndex(normalized)
+    classification = matcher.classify(normalized)
+    from_index = matcher.classify_index(token_index)
+    assert list(from_index.brands) == list(classification.brands)
+    assert list(from_index.branded) == list(classification.branded)
+
+
+@pytest.mark.parametrize("max_distance", [1, 2])
+@pytest.mark.parametrize("seed", range(3))
+def test_fuzzy_matches_pairwise_reference(seed, max_distance):
+    rng = random.Random(seed)
+    brands = normalize_brands(rng.sample(BRANDS, 10))
+    normalized = normalize_keywords(make_keywords(1000, seed))
+    # Ordre des marques indifférent : les égalités de distance se départagent par ordre alphabétique
+    for order in (brands, brands[::-1]):
+        matcher = BrandMatcher(order, max_distance=max_distance)
+        expected = [first_brand(keyword, brands) or fuzzy_brand(keyword, brands, max_distance) for keyword in normalized]
+        assert [matcher.find(keyword) for keyword in normalized] == expected
+
+
+@pytest.mark.parametrize("brands", [["halliburton", "halliburtan"], ["halliburtan", "halliburton"]])
+def test_fuzzy_tie_is_alphabetical(brands):
+    # "halliburtn" est à une faute de chacune : la même marque est retenue quel que soit l'ordre
+    # des marques (et donc dans chaque processus du pool)
+    assert BrandMatcher(brands, max_distance=2).find("rig halliburtn jobs") == "halliburtan"
+
+
+@pytest.mark.parametrize("compiled", [True, False])
+@pytest.mark.parametrize("keyword, expected", [
+    ("what time is it", None),
+    ("c# jobs", "c#"),
+    ("c++ jobs", "c++"),
+    ("objective-c", None),
+    ("AT&T plans", "at&t"),
+    ("h&m store", "h&m"),
+    ("salt & pepper", None),
+    ("w.y. jobs", "w y"),
+])
+def test_symbol_brands_keep_their_symbols(keyword, expected, compiled):
+    # "AT&T" ne se réduit pas à "at t" (trouvé dans "what time"), ni "C++" à "c" (trouvé dans "c# jobs")
+    matcher = variant(BrandMatcher(["AT&T", "C++", "c#", "H&M", "w.y."]), compiled)
+    keywords = normalize_keywords([keyword])
+    assert matcher.find(keywords[0]) == expected
+    assert matcher.find_index(TokenIndex(keywords))[0] == expected
+    assert normalize_text(keyword) == keywords[0]
@@ -0,0 +1,101 @@
+"""Reclassement incrémental après modification de la liste de marques : même résultat qu'un traitement complet."""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from brand_matcher import BrandMatcher, normalize_brands
+from normalization import NORM_COLUMN, normalize_keywords
+from pipeline import (
+    add_classification_columns, aggregate, branded_from_aggregate, classify_frames, merge_frames,
+    reclassify_fusion, slice_classification, synthese_from_aggregate
+)
+from token_index import TokenIndex
+
+BRANDS = [
+    "us", "ny", "uk", "w.y.", "houston", "new york", "algérie", "minnesota", "total energies",
+    "schlumberger", "halliburton", "baker hughes", "côte d'ivoire", "oman", "texas",
+]
+WORDS = [
+    "jobs", "drilling", "engineer", "offshore", "rig", "salary", "bus", "roman", "york", "new",
+    "houstonian", "minesota", "halliburtn", "energies", "total", "hughes", "baker", "texas", "us",
+    "ny", "ivoire", "cote", "d", "algerie", "schlumberger", "uk", "w", "y",
+]
+
+
+def make_keywords(n, seed):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5))) for _ in range(n)]
+
+
+def make_frame(n, seed, file_name):
+    rng = np.random.default_rng(seed)
+    keywords = make_keywords(n, seed)
+    df = pd.DataFrame({
+        "Keyword": keywords,
+        "Search Volume": rng.choice([10, 50, 100, 500, 1000], size=n),
+        "Keyword Difficulty": rng.integers(0, 101, size=n),
+        "Traffic": rng.integers(0, 500, size=n).astype(float),
+        "Fichier": file_name,
+    })
+    df[NORM_COLUMN] = normalize_keywords(df["Keyword"])
+    return df
+
+
+def process(frames, brands, max_distance):
+    frames = [df.copy() for df in frames]
+    classification, state = classify_frames(frames, BrandMatcher(brands, max_distance=max_distance))
+    offset = 0
+    for df in frames:
+        add_classification_columns(df, slice_classification(classification, slice(offset, offset + len(df))), 100, 50)
+        offset += len(df)
+    fusion = merge_frames(frames)
+    return fusion, aggregate(fusion), state
+
+
+def brand_edits(seed):
+    # Listes successives : retraits, ajouts (courts, longs, multi-mots) et remplacement complet
+    rng = random.Random(seed)
+    lists = [normalize_brands(rng.sample(BRANDS, 8)) for _ in range(4)]
+    return lists + [normalize_brands(BRANDS), normalize_brands([]), normalize_brands(BRANDS[:3])]
+
+
+@pytest.mark.parametrize("max_distance", [0, 1, 2])
+@pytest.mark.parametrize("seed", range(3))
+def test_refind_index_matches_find_index(seed, max_distance):
+    token_index = TokenIndex(normalize_keywords(make_keywords(3000, seed)))
+    edits = brand_edits(seed)
+    previous = BrandMatcher(edits[0], max_distance=max_distance)
+    found = previous.find_index(token_index)
+    for brands in edits[1:]:
+        matcher = BrandMatcher(brands, max_distance=max_distance)
+        found = matcher.refind_index(token_index, found, previous.brands)
+        expected = matcher.find_index(token_index)
+        assert list(found) == list(expected)
+        previous = matcher
+
+
+@pytest.mark.parametrize("max_distance", [0, 1])
+def test_reclassify_fusion_matches_full_run(max_distance):
+    frames = [make_frame(2000, 1, "Acme"), make_frame(1500, 2, "Globex")]
+    edits = brand_edits(7)
+    fusion, table, state = process(frames, edits[0], max_distance)
+    for brands in edits[1:]:
+        table, state = reclassify_fusion(
+            fusion, table, state, BrandMatcher(brands, max_distance=max_distance), 100, 50
+        )
+        expected_fusion, expected_table, expected_state = process(frames, brands, max_distance)
+
+        assert list(state["found"]) == list(expected_state["found"])
+        assert fusion["branded"].equals(expected_fusion["branded"])
+        assert list(fusion["reason"].astype(str)) == list(expected_fusion["reason"].astype(str))
+        pd.testing.assert_frame_equal(
+            synthese_from_aggregate(table, ["Acme", "Globex"]),
+            synthese_from_aggregate(expected_table, ["Acme", "Globex"]),
+        )
+        pd.testing.assert_frame_equal(
+            branded_from_aggregate(table).set_index("Fichier").sort_index(),
+            branded_from_aggregate(expected_table).set_index("Fichier").sort_index(),
+            check_dtype=False,
+        )
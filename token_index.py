@@ -0,0 +1,69 @@
+"""Index inversé mot -> mots-clés, construit une fois au chargement d'un fichier."""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+def keywords_key(normalized):
+    """Empreinte du contenu d'une colonne de mots-clés canoniques (ordre compris)."""
+    hashes = pd.util.hash_pandas_object(pd.Series(normalized, dtype=object).fillna(""), index=False)
+    return hashlib.sha256(hashes.to_numpy().tobytes()).hexdigest()
+
+
+class TokenIndex:
+    """Index inversé des mots-clés canoniques d'un fichier.
+
+    Les mots-clés distincts sont numérotés (codes donne, pour chaque ligne, le numéro de son
+    mot-clé) et chaque mot renvoie la liste triée des mots-clés qui le contiennent.
+    """
+
+    def __init__(self, normalized):
+        codes, keywords = pd.factorize(pd.Series(normalized, dtype=object).fillna(""))
+        self.codes = codes
+        self.keywords = np.asarray(keywords, dtype=object)
+
+        tokens = pd.Series(self.keywords, dtype=object).str.split(" ").explode()
+        tokens = tokens[tokens.notna() & (tokens != "")]
+        token_codes, vocab = pd.factorize(tokens)
+        keyword_ids = tokens.index.to_numpy()
+
+        # Tri par mot puis par mot-clé ; un mot répété dans un même mot-clé n'est gardé qu'une fois
+        order = np.lexsort((keyword_ids, token_codes))
+        token_codes, keyword_ids = token_codes[order], keyword_ids[order]
+        keep = np.ones(len(order), dtype=bool)
+        keep[1:] = (token_codes[1:] != token_codes[:-1]) | (keyword_ids[1:] != keyword_ids[:-1])
+        token_codes, keyword_ids = token_codes[keep], keyword_ids[keep]
+
+        self._postings = keyword_ids
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(token_codes, minlength=len(vocab)))))
+        self._vocab = dict(zip(vocab, range(len(vocab))))
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def tokens(self):
+        """Vocabulaire de l'index."""
+        return self._vocab.keys()
+
+    def lookup(self, token):
+        """Numéros des mots-clés distincts contenant le mot token."""
+        pos = self._vocab.get(token)
+        if pos is None:
+            return self._postings[:0]
+        return self._postings[self._offsets[pos]:self._offsets[pos + 1]]
+
+    def lookup_all(self, tokens):
+        """Numéros des mots-clés contenant tous les mots de tokens (sans vérifier leur ordre)."""
+        ids = None
+        for token in sorted(set(tokens), key=lambda t: len(self.lookup(t))):
+            found = self.lookup(token)
+            ids = found if ids is None else np.intersect1d(ids, found, assume_unique=True)
+            if not len(ids):
+                break
+        return self._postings[:0] if ids is None else ids
+
+    def rows(self, keyword_ids):
+        """Positions des lignes dont le mot-clé fait partie de keyword_ids."""
+        return np.flatnonzero(np.isin(self.codes, keyword_ids))